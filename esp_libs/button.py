@@ -0,0 +1,66 @@
+from machine import Pin
+
+from .utils import ticks_diff, ticks_ms
+
+"""
+Button
+from button import Button
+button = Button(Pin(15, Pin.IN, Pin.PULL_UP), scheduler, event="button")
+scheduler.subscribe("button", lambda value: print("pressed"))
+"""
+
+
+class Button:
+    """
+    Push button handled by interrupt. Each debounced press posts an event to
+    the scheduler, so nothing polls the pin while it is idle. Both edges are
+    debounced and the button must be released before the next press, so the
+    bounces of a release never post a press.
+    """
+
+    def __init__(self, pin, scheduler, event, debounce_ms=50, active_low=True):
+        """
+        Args:
+            pin (Pin): Input pin of the button.
+            scheduler (Scheduler): Scheduler that receives the events.
+            event (str): Name of the posted event.
+            debounce_ms (int): Ignore edges closer than this to the last edge (default: 50).
+            active_low (bool): The pin reads 0 while pressed (default: True).
+        """
+        self.pin = pin
+        self.scheduler = scheduler
+        self.event = event
+        self.debounce_ms = debounce_ms
+        self.active_low = active_low
+        self.presses = 0
+        self._last_edge = ticks_ms()
+        self._held = False
+
+        self.pin.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self._irq_handler)
+
+    def _irq_handler(self, pin):
+        now = ticks_ms()
+        bounce = ticks_diff(now, self._last_edge) < self.debounce_ms
+        self._last_edge = now
+        if bounce:
+            return
+        self._update(pin.value() != self.active_low)
+
+    def _update(self, pressed):
+        if not pressed:
+            self._held = False
+        elif not self._held:
+            self._held = True
+            self.presses += 1
+            self.scheduler.post(self.event, self.presses)
+
+    def check(self):
+        """
+        Post a press if the button is held down and its press was not posted
+        yet. A press that woke the board from light sleep ended its edge
+        before the interrupt could see it.
+        """
+        self._update(self.pin.value() != self.active_low)
+
+    def disable(self):
+        self.pin.irq(handler=None)
@@ -0,0 +1,194 @@
+import math
+
+from .utils import ticks_diff, ticks_us
+
+"""
+Fast paths
+Compiled with @micropython.native/@micropython.viper on the device, pure
+Python everywhere else. The drivers only use the public names below.
+
+from fastpath import IMPLEMENTATION, verify, benchmark
+print(IMPLEMENTATION)
+verify()
+benchmark()
+"""
+
+# Same values as esp_libs.lcd and esp_libs.stepmotor
+MASK_RS = 0x01
+MASK_E = 0x04
+SHIFT_DATA = 4
+
+CLOCKWISE = 1
+COUNTER_CLOCKWISE = 2
+
+# Thermistor: 10k NTC, B = 3950, 10k divider on a 12 bit ADC
+_ADC_MAX = 4095
+_INV_T0 = 1 / (273.15 + 25)
+_INV_B = 1 / 3950
+
+
+def _pack_nibbles_py(buf, value, flags):
+    """
+    Fill buf with the 4 PCF8574 bytes that write value in 4 bit mode: high
+    nibble with E set, high nibble, low nibble with E set, low nibble.
+
+    Args:
+        buf (bytearray): Buffer with at least 4 bytes.
+        value (int): Command or data byte.
+        flags (int): RS and backlight bits.
+    """
+    high = flags | (((value >> 4) & 0x0F) << SHIFT_DATA)
+    low = flags | ((value & 0x0F) << SHIFT_DATA)
+    buf[0] = high | MASK_E
+    buf[1] = high
+    buf[2] = low | MASK_E
+    buf[3] = low
+
+
+def _next_phase_py(out, direction):
+    """
+    Args:
+        out (int): Current coil (0x01, 0x02, 0x04 or 0x08).
+        direction (int): CLOCKWISE or COUNTER_CLOCKWISE.
+    Returns:
+        int: The next coil to energize.
+    """
+    if direction == CLOCKWISE:
+        if out != 0x08:
+            return out << 1
+        return 0x01
+    if direction == COUNTER_CLOCKWISE:
+        if out != 0x01:
+            return out >> 1
+        return 0x08
+    return out
+
+
+def _adc_to_celsius_py(adc_value):
+    """
+    Args:
+        adc_value (int): Raw 12 bit reading of the thermistor divider.
+    Returns:
+        float: Temperature in degrees Celsius.
+    """
+    return 1 / (_INV_T0 + math.log(adc_value / (_ADC_MAX - adc_value)) * _INV_B) - 273.15
+
+
+pack_nibbles = _pack_nibbles_py
+next_phase = _next_phase_py
+adc_to_celsius = _adc_to_celsius_py
+IMPLEMENTATION = "python"
+
+try:
+    import micropython
+except ImportError:
+    micropython = None
+
+if micropython is not None:
+
+    @micropython.viper
+    def _pack_nibbles_viper(buf, value: int, flags: int):
+        p = ptr8(buf)  # noqa: F821, viper builtin
+        high = flags | (((value >> 4) & 0x0F) << 4)
+        low = flags | ((value & 0x0F) << 4)
+        p[0] = high | 0x04
+        p[1] = high
+        p[2] = low | 0x04
+        p[3] = low
+
+    @micropython.viper
+    def _next_phase_viper(out: int, direction: int) -> int:
+        if direction == 1:
+            if out != 0x08:
+                return out << 1
+            return 0x01
+        if direction == 2:
+            if out != 0x01:
+                return out >> 1
+            return 0x08
+        return out
+
+    @micropython.native
+    def _adc_to_celsius_native(adc_value):
+        return (
+            1 / (_INV_T0 + math.log(adc_value / (_ADC_MAX - adc_value)) * _INV_B)
+            - 273.15
+        )
+
+    pack_nibbles = _pack_nibbles_viper
+    next_phase = _next_phase_viper
+    adc_to_celsius = _adc_to_celsius_native
+    IMPLEMENTATION = "viper"
+
+
+def verify():
+    """
+    Check that the selected implementations give the same results as the pure
+    Python ones for every possible input.
+
+    Returns:
+        bool: True when every path matches.
+    """
+    ok = True
+
+    expected = bytearray(4)
+    result = bytearray(4)
+    for flags in (0, MASK_RS, 1 << 3, MASK_RS | (1 << 3)):
+        for value in range(256):
+            _pack_nibbles_py(expected, value, flags)
+            pack_nibbles(result, value, flags)
+            if result != expected:
+                print("FASTPATH: pack_nibbles differs for {} {}".format(value, flags))
+                ok = False
+                break
+
+    for direction in (CLOCKWISE, COUNTER_CLOCKWISE, 0):
+        for out in (0x01, 0x02, 0x04, 0x08):
+            if next_phase(out, direction) != _next_phase_py(out, direction):
+                print("FASTPATH: next_phase differs for {} {}".format(out, direction))
+                ok = False
+
+    for adc_value in range(1, _ADC_MAX):
+        if adc_to_celsius(adc_value) != _adc_to_celsius_py(adc_value):
+            print("FASTPATH: adc_to_celsius differs for {}".format(adc_value))
+            ok = False
+            break
+
+    return ok
+
+
+def _time_us(function, args, iterations):
+    start = ticks_us()
+    for _ in range(iterations):
+        function(*args)
+    return ticks_diff(ticks_us(), start)
+
+
+def benchmark(iterations=1000):
+    """
+    Print the time of each path with the pure Python and the selected
+    implementation.
+
+    Args:
+        iterations (int): Calls of each function (default: 1000).
+    Returns:
+        dict: Speedup of each path.
+    """
+    buf = bytearray(4)
+    paths = (
+        ("pack_nibbles", _pack_nibbles_py, pack_nibbles, (buf, 0xA5, MASK_RS)),
+        ("next_phase", _next_phase_py, next_phase, (0x04, CLOCKWISE)),
+        ("adc_to_celsius", _adc_to_celsius_py, adc_to_celsius, (2048,)),
+    )
+
+    speedups = {}
+    for name, pure, fast, args in paths:
+        pure_us = _time_us(pure, args, iterations)
+        fast_us = _time_us(fast, args, iterations)
+        speedups[name] = pure_us / fast_us if fast_us else 0.0
+        print(
+            "FASTPATH: {}: python {} us, {} {} us, {:.2f}x".format(
+                name, pure_us, IMPLEMENTATION, fast_us, speedups[name]
+            )
+        )
+    return speedups
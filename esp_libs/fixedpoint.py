@@ -0,0 +1,53 @@
+"""
+Fixed point
+from fixedpoint import LinearMap
+degree_to_duty = LinearMap(in_min=0, in_max=180, out_min=26, out_max=128)
+duty = degree_to_duty.map(90)
+"""
+
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+
+class LinearMap:
+    """
+    Integer version of utils.scale_value for a fixed mapping. The ratio of the
+    mapping is reduced once to its smallest numerator and denominator, so
+    map() only uses small integer multiply and divide and does not allocate
+    float objects. The result is exactly int(scale_value(...)).
+    """
+
+    def __init__(self, in_min, in_max, out_min, out_max):
+        """
+        Args:
+            in_min (int): Lowest input value.
+            in_max (int): Highest input value.
+            out_min (int): Output for in_min.
+            out_max (int): Output for in_max.
+        """
+        self.in_min = in_min
+
+        numerator = out_max - out_min
+        denominator = in_max - in_min
+        if denominator < 0:
+            numerator, denominator = -numerator, -denominator
+        divisor = _gcd(abs(numerator), denominator)
+
+        self.numerator = numerator // divisor
+        self.denominator = denominator // divisor
+        self.offset = out_min * self.denominator
+
+    def map(self, value):
+        """
+        Args:
+            value (int): Input value.
+        Returns:
+            int: Output value, truncated toward zero like int(scale_value(...)).
+        """
+        scaled = (value - self.in_min) * self.numerator + self.offset
+        if scaled >= 0:
+            return scaled // self.denominator
+        return -(-scaled // self.denominator)
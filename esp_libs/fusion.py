@@ -0,0 +1,177 @@
+from .utils import ticks_diff, ticks_ms
+
+"""
+Fusion
+from fusion import TemperatureEstimator
+estimator = TemperatureEstimator()
+estimator.update_fast(thermistor.get_temperature())
+estimator.update_reference(hygrothermograph.get_temperature())
+print(estimator.temperature, estimator.rate, estimator.offset)
+"""
+
+
+class TemperatureEstimator:
+    """
+    Combines a fast but noisy and uncalibrated sensor (the thermistor) with a
+    slow but calibrated one (the DHT). The fast readings drive an alpha-beta
+    filter of the temperature and its rate of change, with the gains of a
+    steady state Kalman filter (beta = alpha² / (2 - alpha)), so the
+    estimate follows a change within a few samples. The first reference
+    reading sets the offset of the fast sensor at once, the next ones
+    refine it as a scalar Kalman filter, so a drifting thermistor is
+    recalibrated online. Those refinements go through the alpha-beta
+    filter, so they never make the estimate jump.
+    """
+
+    def __init__(
+        self,
+        alpha=0.25,
+        beta=0.035,
+        offset_noise=0.00001,
+        reference_noise=1.0,
+        max_residual=5.0,
+        max_rejected=5,
+    ):
+        """
+        Args:
+            alpha (float): Gain of the temperature on each fast reading (default: 0.25).
+            beta (float): Gain of the rate on each fast reading (default: 0.035).
+            offset_noise (float): Variance the offset drifts per second, in °C² (default: 0.00001).
+            reference_noise (float): Variance of a reference reading, in °C² (default: 1.0).
+            max_residual (float): Fast readings further than this from the
+                estimate are rejected as outliers (default: 5.0).
+            max_rejected (int): Consecutive rejected readings that restart the
+                filter, e.g. after a real jump (default: 5).
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.offset_noise = offset_noise
+        self.reference_noise = reference_noise
+        self.max_residual = max_residual
+        self.max_rejected = max_rejected
+
+        self.offset = 0.0
+        self.offset_variance = None
+        self.fast_samples = 0
+        self.reference_samples = 0
+        self.rejected_samples = 0
+        self.reset()
+
+    @property
+    def calibrated(self):
+        """
+        Whether the offset was set by a reference reading.
+        """
+        return self.offset_variance is not None
+
+    def reset(self):
+        """
+        Forget the temperature and the rate, the offset is kept.
+        """
+        self.temperature = None
+        self.rate = 0.0
+        self._rejected = 0
+        self._last_fast = None
+        self._last_reference = None
+        # Offset correction the estimate has not followed yet
+        self._pending = 0.0
+
+    def update_fast(self, value, now=None):
+        """
+        Add a reading of the fast sensor.
+
+        Args:
+            value (float): Raw reading in °C, ignored when None.
+            now (int): Current ticks in milliseconds (default: ticks_ms()).
+        Returns:
+            float: The temperature estimate, None until the first reading.
+        """
+        if value is None:
+            return self.temperature
+        if now is None:
+            now = ticks_ms()
+
+        measurement = value - self.offset
+        if self.temperature is None:
+            self.temperature = measurement
+            self._last_fast = now
+            self.fast_samples += 1
+            return self.temperature
+
+        dt = ticks_diff(now, self._last_fast) / 1000
+        if dt <= 0:
+            return self.temperature
+
+        predicted = self.temperature + self.rate * dt
+        residual = measurement - predicted
+        if abs(residual) > self.max_residual:
+            self.rejected_samples += 1
+            self._rejected += 1
+            if self._rejected >= self.max_rejected:
+                self.reset()
+                return self.update_fast(value, now)
+            return self.temperature
+
+        self._rejected = 0
+        self._last_fast = now
+        self.temperature = predicted + self.alpha * residual
+        self.rate += self.beta * residual / dt
+        self._pending *= 1 - self.alpha
+        self.fast_samples += 1
+        return self.temperature
+
+    def update_reference(self, value, now=None):
+        """
+        Add a reading of the calibrated sensor, corrects the offset.
+
+        Args:
+            value (float): Reading in °C, ignored when None.
+            now (int): Current ticks in milliseconds (default: ticks_ms()).
+        Returns:
+            float: The offset estimate.
+        """
+        if value is None or self.temperature is None:
+            return self.offset
+        if now is None:
+            now = ticks_ms()
+
+        # The fast sensor reads temperature + offset, so an estimate above
+        # the reference means the offset is too small
+        residual = self.temperature - self._pending - value
+        self.reference_samples += 1
+
+        if not self.calibrated:
+            # Unknown offset at boot, take it from the first reading. The
+            # estimate steps to the reference once, see calibrated
+            self.offset += residual
+            self.temperature = value
+            self.offset_variance = self.reference_noise
+            self._last_reference = now
+            return self.offset
+
+        if self._last_reference is not None:
+            dt = ticks_diff(now, self._last_reference) / 1000
+            self.offset_variance += self.offset_noise * dt
+        self._last_reference = now
+
+        gain = self.offset_variance / (self.offset_variance + self.reference_noise)
+        correction = gain * residual
+        self.offset += correction
+        self._pending += correction
+        self.offset_variance *= 1 - gain
+        return self.offset
+
+    def stats(self):
+        """
+        Returns:
+            dict: The estimates and the sample counts.
+        """
+        return {
+            "temperature": self.temperature,
+            "rate_per_min": self.rate * 60,
+            "offset": self.offset,
+            "offset_stddev": self.offset_variance ** 0.5 if self.calibrated else None,
+            "fast_samples": self.fast_samples,
+            "reference_samples": self.reference_samples,
+            "rejected_samples": self.rejected_samples,
+        }
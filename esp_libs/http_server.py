@@ -0,0 +1,166 @@
+import socket
+
+try:
+    import uerrno as errno
+except ImportError:
+    import errno
+
+from .utils import ticks_diff, ticks_ms
+
+"""
+HTTP server
+from http_server import StatusServer
+server = StatusServer(port=80)
+server.set_response("/status", '{"temperature": 37.5}')
+server.start()
+scheduler.add_task("http", server.poll, period_ms=50)
+"""
+
+MAX_REQUEST_SIZE = 1024
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_TEXT = "text/plain; version=0.0.4"
+
+
+class _Client:
+    def __init__(self, sock, now):
+        self.sock = sock
+        self.started = now
+        self.request = b""
+        self.response = None
+        self.sent = 0
+
+
+class StatusServer:
+    """
+    Minimal HTTP/1.0 server with non-blocking sockets, driven by calling
+    poll() from a scheduler task. Responses are built by the application
+    with set_response() and only copied to the sockets, so serving a
+    request never reads a sensor.
+    """
+
+    def __init__(
+        self, port=80, host="0.0.0.0", max_clients=4, backlog=32, timeout_ms=2000
+    ):
+        """
+        Args:
+            port (int): TCP port, 0 picks a free one (default: 80).
+            host (str): Address to listen on (default: "0.0.0.0").
+            max_clients (int): Connections handled at the same time (default: 4).
+            backlog (int): Connections waiting to be accepted, the others are
+                refused by the network stack (default: 32).
+            timeout_ms (int): Close clients that take longer than this (default: 2000).
+        """
+        self.port = port
+        self.host = host
+        self.max_clients = max_clients
+        self.backlog = backlog
+        self.timeout_ms = timeout_ms
+        self.requests = 0
+        self.errors = 0
+        self._sock = None
+        self._clients = []
+        self._responses = {}
+        self._not_found = self._build_response(404, "text/plain", "Not found\n")
+
+    @staticmethod
+    def _build_response(status, content_type, body):
+        if isinstance(body, str):
+            body = body.encode()
+        reason = "OK" if status == 200 else "Not Found"
+        header = (
+            "HTTP/1.0 {} {}\r\n"
+            "Content-Type: {}\r\n"
+            "Content-Length: {}\r\n"
+            "Connection: close\r\n\r\n"
+        ).format(status, reason, content_type, len(body))
+        return header.encode() + body
+
+    def set_response(self, path, body, content_type=CONTENT_TYPE_JSON):
+        """
+        Replace the response served for a path.
+
+        Args:
+            path (str): Request path, e.g. "/status".
+            body (str): Response body.
+            content_type (str): Content type (default: application/json).
+        """
+        self._responses[path] = self._build_response(200, content_type, body)
+
+    def start(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(addr)
+        self._sock.listen(self.backlog)
+        self._sock.setblocking(False)
+        if self.port == 0:
+            self.port = self._sock.getsockname()[1]
+
+    def stop(self):
+        for client in self._clients:
+            client.sock.close()
+        self._clients = []
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def poll(self):
+        """
+        Accept new connections and move every open one forward without
+        blocking.
+        """
+        if self._sock is None:
+            return
+
+        now = ticks_ms()
+
+        while len(self._clients) < self.max_clients:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                break
+            sock.setblocking(False)
+            self._clients.append(_Client(sock, now))
+
+        for client in list(self._clients):
+            try:
+                done = self._handle(client)
+            except OSError as error:
+                if error.args and error.args[0] == errno.EAGAIN:
+                    done = False
+                else:
+                    self.errors += 1
+                    done = True
+
+            if not done and ticks_diff(now, client.started) > self.timeout_ms:
+                self.errors += 1
+                done = True
+
+            if done:
+                client.sock.close()
+                self._clients.remove(client)
+
+    def _handle(self, client):
+        if client.response is None:
+            data = client.sock.recv(MAX_REQUEST_SIZE)
+            if not data:
+                return True
+            client.request += data
+            if b"\r\n\r\n" not in client.request and b"\n\n" not in client.request:
+                return len(client.request) >= MAX_REQUEST_SIZE
+
+            client.response = self._route(client.request)
+            self.requests += 1
+
+        sent = client.sock.send(client.response[client.sent:])
+        client.sent += sent or 0
+        return client.sent >= len(client.response)
+
+    def _route(self, request):
+        try:
+            path = request.split(b" ", 2)[1].decode()
+        except (IndexError, UnicodeError):
+            return self._not_found
+        path = path.split("?", 1)[0]
+        return self._responses.get(path, self._not_found)
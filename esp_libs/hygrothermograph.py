@@ -1,5 +1,9 @@
-from dht import DHT11, DHT22
-from machine import Pin
+try:
+    from dht import DHT11, DHT22
+    from machine import Pin
+except ImportError:
+    # Host machine, only usable with an injected dht (e.g. trace replay)
+    DHT11 = DHT22 = Pin = None
 
 
 class HygrothermographTypeOptions:
@@ -10,8 +14,17 @@ class HygrothermographTypeOptions:
 class Hygrothermograph:
     dht = None
 
-    def __init__(self, data_pin=13, type=HygrothermographTypeOptions.BLUE):
-        if type == HygrothermographTypeOptions.BLUE:
+    def __init__(self, data_pin=13, type=HygrothermographTypeOptions.BLUE, dht=None):
+        """
+        Args:
+            data_pin (int): Data pin of the sensor (default: 13).
+            type (int): HygrothermographTypeOptions of the sensor (default: BLUE).
+            dht: Object with measure(), temperature() and humidity(), used
+                instead of the pin when given (default: None).
+        """
+        if dht is not None:
+            self.dht = dht
+        elif type == HygrothermographTypeOptions.BLUE:
             self.dht = DHT11(Pin(data_pin))
         elif type == HygrothermographTypeOptions.WHITE:
             self.dht = DHT22(Pin(data_pin))
@@ -3,6 +3,8 @@ from time import sleep_ms
 
 from machine import Pin, SoftI2C
 
+from .fastpath import pack_nibbles
+
 # The PCF8574 has a jumper selectable address: 0x20 - 0x27
 
 
@@ -237,10 +239,22 @@ class I2cLcd(LcdBase):
     i2c = None
     i2c_addr = None
 
-    def __init__(self, scl_pin=14, sda_pin=13, num_lines=2, num_columns=16):
-
-        self.i2c = SoftI2C(scl=Pin(scl_pin), sda=Pin(sda_pin))
-        self.i2c_addr = self.i2c.scan()[0]
+    def __init__(
+        self, scl_pin=14, sda_pin=13, num_lines=2, num_columns=16, i2c=None, i2c_addr=None
+    ):
+        """
+        Args:
+            scl_pin (int): SCL pin, ignored when i2c is given (default: 14).
+            sda_pin (int): SDA pin, ignored when i2c is given (default: 13).
+            num_lines (int): Number of display lines (default: 2).
+            num_columns (int): Number of display columns (default: 16).
+            i2c (I2C): Already created bus (default: None).
+            i2c_addr (int): Address of the PCF8574, scans the bus when None (default: None).
+        """
+        # Reused for every write, so writing to the display does not allocate
+        self._buf = bytearray(4)
+        self.i2c = i2c if i2c is not None else SoftI2C(scl=Pin(scl_pin), sda=Pin(sda_pin))
+        self.i2c_addr = i2c_addr if i2c_addr is not None else self.i2c.scan()[0]
 
         self.i2c.writeto(self.i2c_addr, bytearray([0]))
         sleep_ms(20)  # Allow LCD time to powerup
@@ -295,12 +309,10 @@ class I2cLcd(LcdBase):
 
         Data is latched on the falling edge of E.
         """
-        byte = (self.backlight << SHIFT_BACKLIGHT) | (((cmd >> 4) & 0x0F) << SHIFT_DATA)
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = (self.backlight << SHIFT_BACKLIGHT) | ((cmd & 0x0F) << SHIFT_DATA)
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        pack_nibbles(self._buf, cmd, self.backlight << SHIFT_BACKLIGHT)
+        # The PCF8574 outputs each byte in turn, so the E pulses of both
+        # nibbles fit in a single transfer
+        self.i2c.writeto(self.i2c_addr, self._buf)
         if cmd <= 3:
             # The home and clear commands require a worst case delay of 4.1 msec
             sleep_ms(5)
@@ -309,17 +321,5 @@ class I2cLcd(LcdBase):
         """
         Write data to the LCD.
         """
-        byte = (
-            MASK_RS
-            | (self.backlight << SHIFT_BACKLIGHT)
-            | (((data >> 4) & 0x0F) << SHIFT_DATA)
-        )
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
-        byte = (
-            MASK_RS
-            | (self.backlight << SHIFT_BACKLIGHT)
-            | ((data & 0x0F) << SHIFT_DATA)
-        )
-        self.i2c.writeto(self.i2c_addr, bytearray([byte | MASK_E]))
-        self.i2c.writeto(self.i2c_addr, bytearray([byte]))
+        pack_nibbles(self._buf, data, MASK_RS | (self.backlight << SHIFT_BACKLIGHT))
+        self.i2c.writeto(self.i2c_addr, self._buf)
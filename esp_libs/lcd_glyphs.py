@@ -0,0 +1,151 @@
+"""
+LCD glyphs
+from lcd_glyphs import GlyphCache, GraphRenderer
+graphs = GraphRenderer(GlyphCache(lcd))
+lcd.put_str(graphs.bar_graph(value=37.5, min_value=30, max_value=40, width=10))
+lcd.put_str(graphs.sparkline([36.5, 37.0, 37.8], min_value=36, max_value=38))
+"""
+
+# HD44780 ROM characters, they do not use a CGRAM slot
+CHAR_EMPTY = " "
+CHAR_FULL = chr(0xFF)
+
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 8
+
+
+class GlyphCache:
+    """
+    Keeps track of the glyphs uploaded to the 8 CGRAM slots of the display.
+    A glyph already resident is not uploaded again, and when every slot is
+    taken the least recently used one is replaced.
+
+    Replacing a slot changes every character already shown with it, so a
+    single screen must not use more than 8 different glyphs.
+    """
+
+    SLOTS = 8
+
+    def __init__(self, lcd):
+        """
+        Args:
+            lcd (LcdBase): The LCD display.
+        """
+        self.lcd = lcd
+        self._slot_glyphs = [None] * self.SLOTS
+        self._slot_last_use = [0] * self.SLOTS
+        self._use_count = 0
+        self.uploads = 0
+        self.hits = 0
+
+    def char(self, charmap):
+        """
+        Get the character that shows the glyph, uploading it when needed.
+
+        Args:
+            charmap (bytes): The 8 rows of the glyph.
+        Returns:
+            str: The character to write to the display.
+        """
+        charmap = bytes(charmap)
+        self._use_count += 1
+
+        try:
+            slot = self._slot_glyphs.index(charmap)
+            self.hits += 1
+        except ValueError:
+            slot = self._slot_last_use.index(min(self._slot_last_use))
+            self.lcd.custom_char(slot, charmap)
+            self._slot_glyphs[slot] = charmap
+            self.uploads += 1
+
+        self._slot_last_use[slot] = self._use_count
+        return chr(slot)
+
+    def clear(self):
+        """
+        Forget the resident glyphs, e.g. after the display was reset.
+        """
+        self._slot_glyphs = [None] * self.SLOTS
+        self._slot_last_use = [0] * self.SLOTS
+
+
+class GraphRenderer:
+    """
+    Draws horizontal bar graphs and sparklines with the glyph cache.
+    """
+
+    def __init__(self, glyphs):
+        """
+        Args:
+            glyphs (GlyphCache): Cache used to upload the glyphs.
+        """
+        self.glyphs = glyphs
+        # Glyphs with 1 to 4 columns filled from the left
+        self._bar_charmaps = [
+            bytes([(0x1F << (GLYPH_WIDTH - columns)) & 0x1F] * GLYPH_HEIGHT)
+            for columns in range(1, GLYPH_WIDTH)
+        ]
+        # Glyphs with 1 to 7 rows filled from the bottom
+        self._level_charmaps = [
+            bytes([0x00] * (GLYPH_HEIGHT - rows) + [0x1F] * rows)
+            for rows in range(1, GLYPH_HEIGHT)
+        ]
+
+    @staticmethod
+    def _level(value, min_value, max_value, levels):
+        if value is None or max_value <= min_value:
+            return 0
+        level = int((value - min_value) * levels / (max_value - min_value) + 0.5)
+        return max(min(level, levels), 0)
+
+    def bar_graph(self, value, min_value, max_value, width):
+        """
+        Horizontal bar with a resolution of one pixel column.
+
+        Args:
+            value (float): The value to show, an empty bar when None.
+            min_value (float): Value of the empty bar.
+            max_value (float): Value of the full bar.
+            width (int): Number of characters of the bar.
+        Returns:
+            str: The bar, with width characters.
+        """
+        level = self._level(value, min_value, max_value, width * GLYPH_WIDTH)
+        full, partial = divmod(level, GLYPH_WIDTH)
+
+        bar = CHAR_FULL * full
+        if partial:
+            bar += self.glyphs.char(self._bar_charmaps[partial - 1])
+        return bar + CHAR_EMPTY * (width - len(bar))
+
+    def sparkline(self, values, min_value=None, max_value=None):
+        """
+        One character per value, with a column height from 0 to 8 pixels.
+        Uses at most 7 glyphs.
+
+        Args:
+            values (list): The values, None values are left empty.
+            min_value (float): Value of an empty column, the lowest value when None.
+            max_value (float): Value of a full column, the highest value when None.
+        Returns:
+            str: The sparkline, one character per value.
+        """
+        known = [value for value in values if value is not None]
+        if not known:
+            return CHAR_EMPTY * len(values)
+        if min_value is None:
+            min_value = min(known)
+        if max_value is None:
+            max_value = max(known)
+
+        line = ""
+        for value in values:
+            level = self._level(value, min_value, max_value, GLYPH_HEIGHT)
+            if value is None or level == 0:
+                line += CHAR_EMPTY if value is None else "_"
+            elif level == GLYPH_HEIGHT:
+                line += CHAR_FULL
+            else:
+                line += self.glyphs.char(self._level_charmaps[level - 1])
+        return line
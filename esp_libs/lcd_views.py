@@ -0,0 +1,80 @@
+from .utils import ticks_diff, ticks_ms
+
+"""
+LCD views
+from lcd_views import LcdViewManager
+views = LcdViewManager(lcd, pages=(lambda: ("line 1", "line 2"),))
+views.refresh()
+views.next_page()
+"""
+
+
+class LcdViewManager:
+    """
+    Shows one page at a time on the LCD. A page is a function returning one
+    string per display line. Only the lines that changed since the last
+    refresh are written to the display.
+    """
+
+    def __init__(self, lcd, pages, backlight_timeout_ms=60000, clock=None):
+        """
+        Args:
+            lcd (LcdBase): The LCD display.
+            pages (tuple): Functions returning the lines of each page.
+            backlight_timeout_ms (int): Turn the backlight off after this time
+                without a button press, never when None (default: 60000).
+            clock: Object with ticks_ms(), uses the system ticks when None (default: None).
+        """
+        self.lcd = lcd
+        self.pages = pages
+        self.backlight_timeout_ms = backlight_timeout_ms
+        self.clock = clock
+        self.page_index = 0
+        self._shown_lines = [None] * lcd.num_lines
+        self._last_activity = self._ticks_ms()
+        self.lcd.backlight_on()
+
+    def _ticks_ms(self):
+        if self.clock is None:
+            return ticks_ms()
+        return self.clock.ticks_ms()
+
+    def on_button(self, _value=None):
+        """
+        Button handler. The first press wakes the backlight up, the next ones
+        cycle through the pages.
+        """
+        self._last_activity = self._ticks_ms()
+
+        if not self.lcd.backlight:
+            self.lcd.backlight_on()
+            self.refresh()
+        else:
+            self.next_page()
+
+    def next_page(self):
+        self.page_index = (self.page_index + 1) % len(self.pages)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Turn the backlight off after the timeout and draw the current page.
+        """
+        if (
+            self.backlight_timeout_ms is not None
+            and self.lcd.backlight
+            and ticks_diff(self._ticks_ms(), self._last_activity)
+            >= self.backlight_timeout_ms
+        ):
+            self.lcd.backlight_off()
+
+        lines = self.pages[self.page_index]()
+
+        for y in range(self.lcd.num_lines):
+            line = lines[y] if y < len(lines) else ""
+            line = "{:<{}}".format(line, self.lcd.num_columns)[: self.lcd.num_columns]
+
+            if line != self._shown_lines[y]:
+                self.lcd.move_to(0, y)
+                self.lcd.put_str(line)
+                self._shown_lines[y] = line
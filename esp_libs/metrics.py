@@ -0,0 +1,112 @@
+"""
+Metrics
+from metrics import Metrics
+metrics = Metrics()
+metrics.inc("sensor_errors")
+start = ticks_us()
+...
+metrics.time("loop_sensors", ticks_diff(ticks_us(), start))
+print(metrics.prometheus())
+"""
+
+
+# Upper bounds of the histogram buckets in microseconds, the last bucket
+# counts everything above 1 s
+HISTOGRAM_BOUNDS_US = (100, 1000, 10000, 100000, 1000000)
+
+
+class Timing:
+    """
+    Count, total, last and max of a duration in microseconds, plus a
+    histogram with one bucket per decade.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.last_us = 0
+        self.max_us = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+
+    def add(self, us):
+        self.count += 1
+        self.total_us += us
+        self.last_us = us
+        if us > self.max_us:
+            self.max_us = us
+
+        bucket = 0
+        for bound in HISTOGRAM_BOUNDS_US:
+            if us <= bound:
+                break
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_us": self.total_us,
+            "last_us": self.last_us,
+            "max_us": self.max_us,
+            "histogram": list(self.histogram),
+        }
+
+
+class Metrics:
+    """
+    Counters, gauges and timings shared by the control loops. Updating a
+    value is a dict lookup and an integer add, cheap enough for any loop.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def time(self, name, us):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = Timing()
+        timing.add(us)
+
+    def as_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "timings": {name: timing.as_dict() for name, timing in self.timings.items()},
+        }
+
+    def prometheus(self, prefix="brooder"):
+        """
+        Returns:
+            str: The metrics in the Prometheus text format.
+        """
+        lines = []
+        for name, value in self.counters.items():
+            lines.append("# TYPE {}_{}_total counter".format(prefix, name))
+            lines.append("{}_{}_total {}".format(prefix, name, value))
+        for name, value in self.gauges.items():
+            if value is None:
+                continue
+            lines.append("# TYPE {}_{} gauge".format(prefix, name))
+            lines.append("{}_{} {}".format(prefix, name, float(value)))
+        for name, timing in self.timings.items():
+            lines.append("# TYPE {}_{}_seconds summary".format(prefix, name))
+            lines.append(
+                "{}_{}_seconds_count {}".format(prefix, name, timing.count)
+            )
+            lines.append(
+                "{}_{}_seconds_sum {}".format(prefix, name, timing.total_us / 1000000)
+            )
+            lines.append("# TYPE {}_{}_max_seconds gauge".format(prefix, name))
+            lines.append(
+                "{}_{}_max_seconds {}".format(prefix, name, timing.max_us / 1000000)
+            )
+        return "\n".join(lines) + "\n"
+
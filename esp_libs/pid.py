@@ -0,0 +1,208 @@
+from .utils import ticks_add, ticks_diff, ticks_ms
+
+"""
+PID
+from pid import PID, TimeProportionalOutput
+pid = PID(kp=0.5, ki=0.01, kd=0, setpoint=37.5)
+heater = TimeProportionalOutput(relay, window_ms=10000, on_value=0)
+heater.update(pid.compute(thermistor.get_temperature()))
+"""
+
+
+class PID:
+    """
+    PID controller with derivative on measurement and anti-windup. The output
+    is only recomputed once every sample time, so it can be called from a
+    loop faster than the sample time.
+    """
+
+    def __init__(
+        self,
+        kp,
+        ki,
+        kd,
+        setpoint,
+        sample_time_ms=1000,
+        output_min=0.0,
+        output_max=1.0,
+    ):
+        """
+        Args:
+            kp (float): Proportional gain, output per unit of error.
+            ki (float): Integral gain, output per unit of error per second.
+            kd (float): Derivative gain, output per unit of error change per second.
+            setpoint (float): Desired value.
+            sample_time_ms (int): Time between two computations (default: 1000).
+            output_min (float): Lowest output (default: 0.0).
+            output_max (float): Highest output (default: 1.0).
+        """
+        self.setpoint = setpoint
+        self.sample_time_ms = sample_time_ms
+        self.output_min = output_min
+        self.output_max = output_max
+        self.set_tunings(kp, ki, kd)
+        self.reset()
+
+    def set_tunings(self, kp, ki, kd):
+        """
+        Change the gains, can be called while running.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+
+    def reset(self):
+        self.error = 0.0
+        self.integral = 0.0
+        self.output = self.output_min
+        self.samples = 0
+        self.saturated_samples = 0
+        self.sum_abs_error = 0.0
+        self._last_measurement = None
+        self._last_time = None
+
+    def _clamp(self, value):
+        return max(min(value, self.output_max), self.output_min)
+
+    def compute(self, measurement, now=None):
+        """
+        Compute the output for a measurement.
+
+        Args:
+            measurement (float): Current value, keeps the last output when None.
+            now (int): Current ticks in milliseconds (default: ticks_ms()).
+        Returns:
+            float: The output, between output_min and output_max.
+        """
+        if now is None:
+            now = ticks_ms()
+
+        if measurement is None:
+            return self.output
+
+        if self._last_time is not None:
+            if ticks_diff(now, self._last_time) < self.sample_time_ms:
+                return self.output
+            # Keep a fixed sample rate even when called a bit late
+            self._last_time = ticks_add(self._last_time, self.sample_time_ms)
+            if ticks_diff(now, self._last_time) >= self.sample_time_ms:
+                self._last_time = now
+        else:
+            self._last_time = now
+
+        dt = self.sample_time_ms / 1000
+        self.error = self.setpoint - measurement
+
+        if self._last_measurement is None:
+            derivative = 0.0
+        else:
+            derivative = -(measurement - self._last_measurement) / dt
+        self._last_measurement = measurement
+
+        proportional = self.kp * self.error
+        derivative_term = self.kd * derivative
+        integral = self.integral + self.ki * self.error * dt
+
+        output = proportional + integral + derivative_term
+
+        # Anti-windup: stop integrating while the output is saturated in the
+        # same direction as the error, and keep the integral within limits
+        if (output > self.output_max and self.error > 0) or (
+            output < self.output_min and self.error < 0
+        ):
+            self.saturated_samples += 1
+        else:
+            self.integral = self._clamp(integral)
+
+        self.output = self._clamp(proportional + self.integral + derivative_term)
+        self.samples += 1
+        self.sum_abs_error += abs(self.error)
+        return self.output
+
+    def stats(self):
+        """
+        Returns:
+            dict: Last error, integral and output, and the mean absolute error.
+        """
+        return {
+            "setpoint": self.setpoint,
+            "error": self.error,
+            "integral": self.integral,
+            "duty": self.output,
+            "mean_abs_error": self.sum_abs_error / self.samples if self.samples else 0.0,
+            "saturated_samples": self.saturated_samples,
+        }
+
+
+class TimeProportionalOutput:
+    """
+    Drives an on/off output (e.g. a relay) with a duty cycle: the output is on
+    for duty * window_ms at the beginning of every window. Pulses shorter
+    than the minimum on/off times are skipped to save the relay, and a pulse
+    that ended is not restarted before the next window, so the output
+    switches at most twice per window.
+    """
+
+    def __init__(self, pin, window_ms=10000, min_on_ms=1000, min_off_ms=1000, on_value=1):
+        """
+        Args:
+            pin (Pin): Output pin.
+            window_ms (int): Length of a window (default: 10000).
+            min_on_ms (int): Shortest time the output stays on (default: 1000).
+            min_off_ms (int): Shortest time the output stays off (default: 1000).
+            on_value (int): Pin value that turns the output on (default: 1).
+        """
+        self.pin = pin
+        self.window_ms = window_ms
+        self.min_on_ms = min_on_ms
+        self.min_off_ms = min_off_ms
+        self.on_value = on_value
+        self.is_on = False
+        self.switch_count = 0
+        self._window_start = None
+        self._last_switch = None
+        self._pulse_done = False
+        self.pin.value(1 - on_value)
+
+    def update(self, duty, now=None):
+        """
+        Set the output for the current time, call it often (e.g. every 100 ms).
+
+        Args:
+            duty (float): Fraction of the window with the output on (0 to 1).
+            now (int): Current ticks in milliseconds (default: ticks_ms()).
+        Returns:
+            bool: Whether the output is on.
+        """
+        if now is None:
+            now = ticks_ms()
+
+        if self._window_start is None:
+            self._window_start = now
+        while ticks_diff(now, self._window_start) >= self.window_ms:
+            self._window_start = ticks_add(self._window_start, self.window_ms)
+            self._pulse_done = False
+
+        on_time = max(min(duty, 1.0), 0.0) * self.window_ms
+        if on_time < self.min_on_ms:
+            on_time = 0
+        elif self.window_ms - on_time < self.min_off_ms:
+            on_time = self.window_ms
+
+        should_be_on = (
+            not self._pulse_done and ticks_diff(now, self._window_start) < on_time
+        )
+
+        if should_be_on != self.is_on:
+            min_time = self.min_off_ms if should_be_on else self.min_on_ms
+            if (
+                self._last_switch is None
+                or ticks_diff(now, self._last_switch) >= min_time
+            ):
+                self.is_on = should_be_on
+                self._pulse_done = not should_be_on
+                self._last_switch = now
+                self.switch_count += 1
+                self.pin.value(self.on_value if should_be_on else 1 - self.on_value)
+
+        return self.is_on
@@ -0,0 +1,335 @@
+try:
+    from machine import lightsleep
+except ImportError:
+    # Host machine, pass the lightsleep of a VirtualClock to simulate it
+    lightsleep = None
+
+try:
+    import esp32
+except ImportError:
+    # Host machine, the wake pins are only checked after each light sleep
+    esp32 = None
+
+from .scheduler import SystemClock
+from .utils import ticks_add, ticks_diff
+
+"""
+Power
+from power import PowerClock, PowerManager, PowerMode
+scheduler = Scheduler(clock=PowerClock())
+scheduler.clock.wake_on_pin(button.pin, 0, button.check)
+power = PowerManager(
+    scheduler, low_power_periods={"humidity": 10000}, low_power_disabled=("http",)
+)
+power.add_load("backlight", 20, lambda: lcd.backlight)
+scheduler.add_task("power", power.update, period_ms=10000)
+power.set_mode(PowerMode.LOW)
+"""
+
+
+class PowerMode:
+    NORMAL = "normal"
+    LOW = "low"
+
+
+class PowerClock:
+    """
+    Scheduler clock that can wait in light sleep. While light sleep is
+    enabled, every wait of at least min_sleep_ms is spent in
+    machine.lightsleep, shorter ones are not worth the wake up cost. The
+    time spent in each kind of wait is counted for the current estimate.
+
+    Light sleep stops the interrupts, the UART and the Wi-Fi. Only the wake
+    pins end a sleep early, and their callbacks are run on every wake up
+    since the edge that woke the board was not seen by its interrupt. The UART
+    RX pin cannot wake the board, so keep_awake() holds light sleep off
+    once some input was received.
+    """
+
+    def __init__(self, clock=None, lightsleep_ms=None, min_sleep_ms=10):
+        """
+        Args:
+            clock: Clock with ticks_ms() and sleep_ms(ms), used for the time
+                and the normal waits (default: SystemClock).
+            lightsleep_ms (callable): Light sleep for a number of
+                milliseconds, e.g. the sleep_ms of a VirtualClock on a host
+                (default: machine.lightsleep).
+            min_sleep_ms (int): Shortest wait done in light sleep (default: 10).
+        """
+        self.clock = clock if clock is not None else SystemClock()
+        self.lightsleep_ms = lightsleep_ms if lightsleep_ms is not None else lightsleep
+        self.min_sleep_ms = min_sleep_ms
+        self.light_sleep_enabled = False
+        self.idle_ms = 0
+        self.light_sleep_ms = 0
+        self.light_sleeps = 0
+        self._wake_pins = []
+        self._awake_until = None
+
+    def wake_on_pin(self, pin, level, callback=None):
+        """
+        End the light sleeps when a pin reaches a level. The ESP32 wakes on
+        a first pin of any level, then on more pins that are all active
+        high or on a single more pin active low. They must be RTC GPIOs.
+
+        Args:
+            pin (Pin): Input pin.
+            level (int): Pin value that wakes the board.
+            callback (callable): Called without argument after every light
+                sleep, to look at the pin (default: None).
+        """
+        extra = self._wake_pins[1:] + [(pin, level, callback)]
+        if self._wake_pins and len(extra) > 1 and 0 in [other[1] for other in extra]:
+            raise ValueError("only one more wake pin can be active low")
+        self._wake_pins.append((pin, level, callback))
+
+        if esp32 is None:
+            return
+        first_pin, first_level, _ = self._wake_pins[0]
+        esp32.wake_on_ext0(pin=first_pin, level=first_level)
+        if len(self._wake_pins) > 1:
+            esp32.wake_on_ext1(
+                pins=tuple(other[0] for other in self._wake_pins[1:]),
+                level=esp32.WAKEUP_ANY_HIGH if level else esp32.WAKEUP_ALL_LOW,
+            )
+
+    def keep_awake(self, ms):
+        """
+        Wait without light sleep for the next ms milliseconds, e.g. while a
+        command is typed on the UART.
+        """
+        self._awake_until = ticks_add(self.clock.ticks_ms(), ms)
+
+    def ticks_ms(self):
+        return self.clock.ticks_ms()
+
+    def time(self):
+        return self.clock.time()
+
+    def sleep_ms(self, ms):
+        start = self.clock.ticks_ms()
+        if self._awake_until is not None and ticks_diff(self._awake_until, start) <= 0:
+            self._awake_until = None
+        if (
+            self.light_sleep_enabled
+            and self.lightsleep_ms is not None
+            and ms >= self.min_sleep_ms
+            and self._awake_until is None
+        ):
+            self.lightsleep_ms(ms)
+            # a wake pin can wake it up early, count the real time
+            self.light_sleep_ms += ticks_diff(self.clock.ticks_ms(), start)
+            self.light_sleeps += 1
+            for _, _, callback in self._wake_pins:
+                if callback is not None:
+                    callback()
+        else:
+            self.clock.sleep_ms(ms)
+            self.idle_ms += ticks_diff(self.clock.ticks_ms(), start)
+
+
+class _Load:
+    def __init__(self, current_ma, is_on):
+        self.current_ma = current_ma
+        self.is_on = is_on
+
+
+class PowerManager:
+    """
+    Switches the scheduler between the normal and the low power mode. The
+    low power mode slows down the tasks listed in low_power_periods, lets the
+    scheduler wait up to the next due task and spends those waits in light
+    sleep. Tasks that are not listed keep their period, so the heater
+    control is guaranteed to run as often as before. The Wi-Fi does not
+    survive light sleep, so the network tasks are listed in
+    low_power_disabled and stopped until the normal mode, see is_disabled()
+    to keep a supervisor from restarting them meanwhile.
+
+    The current draw is estimated from the time awake, idle and in light
+    sleep plus the loads that are on, and the battery time from the charge
+    used since the low power mode started.
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        low_power_periods,
+        low_power_disabled=(),
+        low_power_max_idle_ms=1000,
+        battery_mah=2000,
+        active_ma=50,
+        idle_ma=20,
+        light_sleep_ma=2,
+        metrics=None,
+    ):
+        """
+        Args:
+            scheduler (Scheduler): Scheduler using a PowerClock.
+            low_power_periods (dict): Task name to period in the low power mode.
+            low_power_disabled (tuple): Names of the tasks stopped in the low
+                power mode (default: ()).
+            low_power_max_idle_ms (int): Longest wait between two event
+                checks in the low power mode, the button latency (default: 1000).
+            battery_mah (int): Battery capacity (default: 2000).
+            active_ma (float): Current while running tasks (default: 50).
+            idle_ma (float): Current while waiting awake (default: 20).
+            light_sleep_ma (float): Current in light sleep (default: 2).
+            metrics (Metrics): Where the estimates are published (default: None).
+        """
+        self.scheduler = scheduler
+        self.clock = scheduler.clock
+        self.low_power_periods = low_power_periods
+        self.low_power_disabled = low_power_disabled
+        self.low_power_max_idle_ms = low_power_max_idle_ms
+        self.battery_mah = battery_mah
+        self.active_ma = active_ma
+        self.idle_ma = idle_ma
+        self.light_sleep_ma = light_sleep_ma
+        self.metrics = metrics
+
+        self.mode = PowerMode.NORMAL
+        self.current_ma = None
+        self.used_mah = 0.0
+        self.on_battery_ms = 0
+        self._loads = {}
+        self._callbacks = []
+        self._normal_periods = {}
+        # name of each stopped task to whether it was enabled before
+        self._disabled_tasks = {}
+        self._normal_max_idle_ms = scheduler.max_idle_ms
+        self._last_ms = self.clock.ticks_ms()
+        self._last_idle_ms = self.clock.idle_ms
+        self._last_light_sleep_ms = self.clock.light_sleep_ms
+
+    def add_load(self, name, current_ma, is_on):
+        """
+        Add a device to the current estimate.
+
+        Args:
+            name (str): Load name.
+            current_ma (float): Current while on.
+            is_on (callable): Returns whether the load is on.
+        """
+        self._loads[name] = _Load(current_ma, is_on)
+
+    def on_change(self, callback):
+        """
+        Call callback(mode) after every mode change, e.g. to turn the
+        backlight off.
+        """
+        self._callbacks.append(callback)
+
+    def set_mode(self, mode):
+        """
+        Args:
+            mode (str): PowerMode.NORMAL or PowerMode.LOW.
+        """
+        if mode == self.mode:
+            return
+        if mode not in (PowerMode.NORMAL, PowerMode.LOW):
+            raise ValueError("unknown power mode: {}".format(mode))
+
+        # close the estimate of the previous mode
+        self.update()
+
+        if mode == PowerMode.LOW:
+            for name, period_ms in self.low_power_periods.items():
+                task = self.scheduler.get_task(name)
+                if task is None:
+                    continue
+                self._normal_periods[name] = task.period_ms
+                task.period_ms = period_ms
+            for name in self.low_power_disabled:
+                task = self.scheduler.get_task(name)
+                if task is None:
+                    continue
+                self._disabled_tasks[name] = task.enabled
+                task.enabled = False
+            self._normal_max_idle_ms = self.scheduler.max_idle_ms
+            self.scheduler.max_idle_ms = self.low_power_max_idle_ms
+            self.used_mah = 0.0
+            self.on_battery_ms = 0
+        else:
+            for name, period_ms in self._normal_periods.items():
+                self.scheduler.get_task(name).period_ms = period_ms
+            self._normal_periods = {}
+            now = self.clock.ticks_ms()
+            for name, was_enabled in self._disabled_tasks.items():
+                if was_enabled:
+                    task = self.scheduler.get_task(name)
+                    task.enabled = True
+                    task.next_run = now
+            self._disabled_tasks = {}
+            self.scheduler.max_idle_ms = self._normal_max_idle_ms
+
+        self.clock.light_sleep_enabled = mode == PowerMode.LOW
+        self.mode = mode
+        print("POWER: {} mode".format(mode))
+        for callback in self._callbacks:
+            callback(mode)
+
+    def is_disabled(self, name):
+        """
+        Returns:
+            bool: Whether the task is stopped by the low power mode, e.g. to
+            delay a restart by the supervisor until the normal mode.
+        """
+        return name in self._disabled_tasks
+
+    def update(self):
+        """
+        Estimate the current since the last update, called periodically.
+        """
+        now = self.clock.ticks_ms()
+        elapsed = ticks_diff(now, self._last_ms)
+        if elapsed <= 0:
+            return
+        idle = self.clock.idle_ms - self._last_idle_ms
+        light_sleep = self.clock.light_sleep_ms - self._last_light_sleep_ms
+        active = max(elapsed - idle - light_sleep, 0)
+        self._last_ms = now
+        self._last_idle_ms = self.clock.idle_ms
+        self._last_light_sleep_ms = self.clock.light_sleep_ms
+
+        loads_ma = 0
+        for load in self._loads.values():
+            if load.is_on():
+                loads_ma += load.current_ma
+
+        self.current_ma = (
+            active * self.active_ma
+            + idle * self.idle_ma
+            + light_sleep * self.light_sleep_ma
+        ) / elapsed + loads_ma
+
+        if self.mode == PowerMode.LOW:
+            self.on_battery_ms += elapsed
+            self.used_mah += self.current_ma * elapsed / 3600000
+
+        if self.metrics is not None:
+            self.metrics.set("power_current_ma", self.current_ma)
+            self.metrics.set("power_battery_hours", self.battery_hours())
+
+    def battery_hours(self):
+        """
+        Returns:
+            float: Hours left on the battery at the current draw, None before
+            the first estimate.
+        """
+        if not self.current_ma:
+            return None
+        return max(self.battery_mah - self.used_mah, 0) / self.current_ma
+
+    def status(self):
+        """
+        Returns:
+            dict: The mode, the current estimate and the battery time.
+        """
+        return {
+            "mode": self.mode,
+            "current_ma": self.current_ma,
+            "battery_hours": self.battery_hours(),
+            "on_battery_s": self.on_battery_ms // 1000,
+            "used_mah": self.used_mah,
+            "light_sleeps": self.clock.light_sleeps,
+        }
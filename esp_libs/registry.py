@@ -0,0 +1,162 @@
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+from .utils import ticks_diff, ticks_ms
+
+"""
+Device registry
+from registry import DeviceRegistry
+registry = DeviceRegistry()
+registry.register("thermistor", lambda: Thermistor(pin=36))
+thermistor = registry.get("thermistor")
+servo = registry.lazy("servo")
+registry.report()
+"""
+
+
+class _LazyDevice:
+    """
+    Stands for a registered device, which is built on the first access to
+    one of its attributes.
+    """
+
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+
+class DeviceRegistry:
+    """
+    Builds devices lazily on first use, measures how long each one took to
+    initialize and keeps the discovered I2C addresses in flash, so the next
+    boot does not need to scan the whole bus again.
+    """
+
+    def __init__(self, cache_path="device_cache.json"):
+        """
+        Args:
+            cache_path (str): File used to persist the discovered I2C addresses.
+        """
+        self.cache_path = cache_path
+        self._factories = {}
+        self._devices = {}
+        self._init_costs = {}
+        self._addresses = self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        try:
+            with open(self.cache_path, "w") as file:
+                json.dump(self._addresses, file)
+        except OSError as error:
+            print("DEVICE_REGISTRY: Could not save cache: {}".format(error))
+
+    def register(self, name, factory):
+        """
+        Register a device factory. The factory is only called on the first get.
+
+        Args:
+            name (str): Device name.
+            factory (callable): Function without arguments that builds the device.
+        """
+        self._factories[name] = factory
+
+    def get(self, name):
+        """
+        Get a device, building it if this is the first use.
+
+        Args:
+            name (str): Device name.
+        Returns:
+            The device instance.
+        """
+        device = self._devices.get(name)
+        if device is None:
+            start = ticks_ms()
+            device = self._factories[name]()
+            self._init_costs[name] = ticks_diff(ticks_ms(), start)
+            self._devices[name] = device
+        return device
+
+    def lazy(self, name):
+        """
+        Get a stand-in for a device that is only built when it is first used,
+        e.g. an actuator that does not need to move before the first sample.
+
+        Args:
+            name (str): Device name.
+        Returns:
+            Object forwarding every attribute to the device.
+        """
+        return _LazyDevice(self, name)
+
+    def is_registered(self, name):
+        return name in self._factories
+
+    def is_initialized(self, name):
+        return name in self._devices
+
+    def init_all(self):
+        """
+        Build every registered device that was not used yet.
+        """
+        for name in self._factories:
+            self.get(name)
+
+    def init_costs(self):
+        """
+        Returns:
+            dict: Initialization time in milliseconds of each built device.
+        """
+        return dict(self._init_costs)
+
+    def report(self):
+        for name, cost in self._init_costs.items():
+            print("DEVICE_REGISTRY: {} initialized in {} ms".format(name, cost))
+
+    def i2c_address(self, name, i2c, address=None):
+        """
+        Find the I2C address of a device. An explicit address is used as is,
+        otherwise the cached address is probed and the bus is only scanned
+        when the device does not answer on it.
+
+        Args:
+            name (str): Key of the device in the cache.
+            i2c (I2C): Bus where the device is connected.
+            address (int): Explicit address, skips the discovery (default: None).
+        Returns:
+            int: The device address.
+        """
+        if address is not None:
+            return address
+
+        address = self._addresses.get(name)
+        if address is not None and self._probe(i2c, address):
+            return address
+
+        found = i2c.scan()
+        if not found:
+            raise OSError("no I2C device found for {}".format(name))
+
+        self._addresses[name] = found[0]
+        self._save_cache()
+        return found[0]
+
+    @staticmethod
+    def _probe(i2c, address):
+        try:
+            i2c.writeto(address, b"")
+            return True
+        except OSError:
+            return False
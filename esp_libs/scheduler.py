@@ -0,0 +1,194 @@
+import time
+
+from .utils import sleep_ms, ticks_add, ticks_diff, ticks_ms, ticks_us
+
+"""
+Scheduler
+from scheduler import Scheduler
+scheduler = Scheduler()
+scheduler.add_task("blink", lambda: led.value(not led.value()), period_ms=500)
+scheduler.subscribe("button", lambda value: print("pressed"))
+scheduler.run_forever()
+"""
+
+
+class SystemClock:
+    """
+    Clock used by the scheduler on the device.
+    """
+
+    def ticks_ms(self):
+        return ticks_ms()
+
+    def time(self):
+        """
+        Seconds since the epoch, unlike ticks_ms() it does not wrap around.
+        """
+        return time.time()
+
+    def sleep_ms(self, ms):
+        sleep_ms(ms)
+
+
+class VirtualClock:
+    """
+    Clock that only moves when asked, sleeping advances it instantly. Used to
+    run the scheduler on a host faster than real time.
+    """
+
+    def __init__(self, start_ms=0):
+        self.now_ms = start_ms
+
+    def ticks_ms(self):
+        return self.now_ms
+
+    def time(self):
+        return self.now_ms // 1000
+
+    def sleep_ms(self, ms):
+        self.now_ms += ms
+
+
+class Task:
+    def __init__(self, name, callback, period_ms, next_run):
+        self.name = name
+        self.callback = callback
+        self.period_ms = period_ms
+        self.next_run = next_run
+        self.enabled = True
+
+
+class Scheduler:
+    """
+    Cooperative scheduler running periodic tasks and dispatching events
+    posted by interrupt handlers, all from a single thread.
+    """
+
+    def __init__(self, clock=None, max_idle_ms=50, metrics=None):
+        """
+        Args:
+            clock: Object with ticks_ms() and sleep_ms(ms) (default: SystemClock).
+            max_idle_ms (int): Longest sleep between two event checks (default: 50).
+            metrics (Metrics): Records the run time of each task as
+                "task_<name>" when given (default: None).
+        """
+        self.clock = clock if clock is not None else SystemClock()
+        self.max_idle_ms = max_idle_ms
+        self.metrics = metrics
+        self.tasks = []
+        self._handlers = {}
+        self._events = []
+
+    def add_task(self, name, callback, period_ms, delay_ms=0):
+        """
+        Add a periodic task.
+
+        Args:
+            name (str): Task name.
+            callback (callable): Function without arguments called on each run.
+            period_ms (int): Time between two runs in milliseconds.
+            delay_ms (int): Time until the first run in milliseconds (default: 0).
+        Returns:
+            Task: The created task.
+        """
+        task = Task(
+            name, callback, period_ms, ticks_add(self.clock.ticks_ms(), delay_ms)
+        )
+        self.tasks.append(task)
+        return task
+
+    def get_task(self, name):
+        for task in self.tasks:
+            if task.name == name:
+                return task
+        return None
+
+    def subscribe(self, event, handler):
+        """
+        Call handler(value) every time the event is posted.
+        """
+        self._handlers.setdefault(event, []).append(handler)
+
+    def post(self, event, value=None):
+        """
+        Queue an event. Safe to call from a (soft) interrupt handler, the
+        handlers only run later from the scheduler loop.
+        """
+        self._events.append((event, value))
+
+    def _dispatch_events(self):
+        while self._events:
+            event, value = self._events.pop(0)
+            for handler in self._handlers.get(event, ()):
+                handler(value)
+
+    def next_deadline_ms(self):
+        """
+        Returns:
+            int: Milliseconds until the next task is due, None without tasks.
+        """
+        now = self.clock.ticks_ms()
+        wait = None
+        for task in self.tasks:
+            if not task.enabled:
+                continue
+            remaining = max(ticks_diff(task.next_run, now), 0)
+            if wait is None or remaining < wait:
+                wait = remaining
+        return wait
+
+    def run_once(self):
+        """
+        Dispatch pending events and run every task that is due.
+
+        Returns:
+            int: Milliseconds until the next task is due, None without tasks.
+        """
+        self._dispatch_events()
+
+        for task in self.tasks:
+            if not task.enabled:
+                continue
+            now = self.clock.ticks_ms()
+            if ticks_diff(task.next_run, now) <= 0:
+                task.next_run = ticks_add(task.next_run, task.period_ms)
+                # Do not try to catch up when a run took longer than the period
+                if ticks_diff(task.next_run, now) <= 0:
+                    task.next_run = ticks_add(now, task.period_ms)
+                if self.metrics is None:
+                    task.callback()
+                else:
+                    start = ticks_us()
+                    task.callback()
+                    self.metrics.time(
+                        "task_" + task.name, ticks_diff(ticks_us(), start)
+                    )
+
+        return self.next_deadline_ms()
+
+    def run_until(self, end_ms):
+        """
+        Run the tasks until the clock reaches end_ms, sleeping between them.
+        Mostly useful with a VirtualClock, where sleeping is instant.
+
+        Args:
+            end_ms (int): Clock ticks where the run stops.
+        """
+        while ticks_diff(end_ms, self.clock.ticks_ms()) > 0:
+            wait = self.run_once()
+            if self._events:
+                continue
+            remaining = ticks_diff(end_ms, self.clock.ticks_ms())
+            if wait is None or wait > remaining:
+                wait = remaining
+            self.clock.sleep_ms(max(wait, 1))
+
+    def run_forever(self):
+        while True:
+            wait = self.run_once()
+            if self._events:
+                continue
+            if wait is None or wait > self.max_idle_ms:
+                wait = self.max_idle_ms
+            if wait > 0:
+                self.clock.sleep_ms(wait)
@@ -2,7 +2,7 @@ import time
 
 from machine import PWM, Pin
 
-from .utils import scale_value
+from .fixedpoint import LinearMap
 
 """
 from servo import Servo
@@ -24,6 +24,14 @@ class Servo:
         self.pwm.duty(init_duty)
 
         self.max_degree = max_degree
+        # Last commanded position, the duty to degree conversion is not exact
+        self.degree = None
+        self._degree_to_duty = LinearMap(
+            in_min=0, in_max=max_degree, out_min=26, out_max=128
+        )
+        self._duty_to_degree = LinearMap(
+            in_min=26, in_max=128, out_min=0, out_max=max_degree
+        )
 
     def __del__(self):
         self.pwm.deinit()
@@ -38,10 +46,9 @@ class Servo:
             None
         """
         speed = max(min(speed, 100), 1)  # Ensure speed is between 1 and 100
-        speed_factor = speed / 100.0  # Calculate the speed factor as a float
 
         current_degree = self.get_degree()
-        steps = int(abs(degree - current_degree) * speed_factor)
+        steps = abs(degree - current_degree) * speed // 100
 
         if degree > current_degree:
             for _ in range(steps):
@@ -54,6 +61,25 @@ class Servo:
                 self._move_servo(current_degree)
                 time.sleep(0.01)
 
+    def step_toward(self, degree):
+        """
+        Move one degree toward a position, without waiting. Calling it every
+        10 ms moves like set_degree with full speed.
+        Args:
+            degree (int): Desired position in degrees
+        Returns:
+            bool: True when the position was reached
+        """
+        current_degree = self.degree if self.degree is not None else self.get_degree()
+
+        if degree > current_degree:
+            self._move_servo(current_degree + 1)
+        elif degree < current_degree:
+            self._move_servo(current_degree - 1)
+        else:
+            return True
+        return self.degree == degree
+
     def _move_servo(self, degree):
         """
         Set degree position
@@ -62,12 +88,8 @@ class Servo:
         Returns:
             None
         """
-        duty = int(
-            scale_value(
-                value=degree, in_min=0, in_max=self.max_degree, out_min=26, out_max=128
-            )
-        )
-        self.pwm.duty(duty)
+        self.degree = degree
+        self.pwm.duty(self._degree_to_duty.map(degree))
 
     def get_degree(self):
         """
@@ -75,10 +97,4 @@ class Servo:
         Returns:
             Int: Position in degrees
         """
-        _duty = self.pwm.duty()
-        degree = int(
-            scale_value(
-                value=_duty, in_min=26, in_max=128, out_min=0, out_max=self.max_degree
-            )
-        )
-        return degree
+        return self._duty_to_degree.map(self.pwm.duty())
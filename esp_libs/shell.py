@@ -0,0 +1,153 @@
+import gc
+import sys
+
+try:
+    import uselect as select
+except ImportError:
+    import select
+
+"""
+Shell
+from shell import DiagnosticShell
+shell = DiagnosticShell(metrics=metrics)
+shell.register("hello", lambda args: "hello " + " ".join(args), "Say hello")
+scheduler.add_task("shell", shell.poll, period_ms=100)
+"""
+
+MAX_LINE = 80
+
+
+class DiagnosticShell:
+    """
+    Line based command shell on the UART/REPL, driven by calling poll()
+    from a scheduler task. poll() only checks whether a character is
+    waiting, so an idle shell costs one poll call per run. Commands return
+    their whole output as a string, which is then written a few bytes per
+    poll so a long dump never holds the loop for long.
+    """
+
+    def __init__(
+        self, metrics=None, stream_in=None, stream_out=None, chunk_size=64, on_input=None
+    ):
+        """
+        Args:
+            metrics (Metrics): Shown by the "timings" and "counters" commands (default: None).
+            stream_in: Unbuffered input stream (default: sys.stdin).
+            stream_out: Output stream (default: sys.stdout).
+            chunk_size (int): Characters written on each poll (default: 64).
+            on_input (callable): Called on each poll that received input, e.g.
+                to keep the board out of light sleep (default: None).
+        """
+        self.metrics = metrics
+        self.stream_in = stream_in if stream_in is not None else sys.stdin
+        self.stream_out = stream_out if stream_out is not None else sys.stdout
+        self.chunk_size = chunk_size
+        self.on_input = on_input
+        self._commands = {}
+        self._line = ""
+        self._output = ""
+        self._poller = select.poll()
+        self._poller.register(self.stream_in, select.POLLIN)
+
+        self.register("help", self._help, "List the commands")
+        self.register("heap", self._heap, "Heap and GC statistics")
+        if metrics is not None:
+            self.register("timings", self._timings, "Loop timing histograms")
+            self.register("counters", self._counters, "Counters and gauges")
+
+    def register(self, name, handler, help_text=""):
+        """
+        Add a command.
+
+        Args:
+            name (str): Command name.
+            handler (callable): Called with the list of arguments, returns the output.
+            help_text (str): One line description (default: "").
+        """
+        self._commands[name] = (handler, help_text)
+
+    def write(self, text):
+        """
+        Queue text to be written by the next polls.
+        """
+        self._output += text
+
+    def poll(self):
+        if self._output:
+            self.stream_out.write(self._output[: self.chunk_size])
+            self._output = self._output[self.chunk_size :]
+
+        while self._poller.poll(0):
+            char = self.stream_in.read(1)
+            if not char:
+                break
+            if self.on_input is not None:
+                self.on_input()
+            if isinstance(char, bytes):
+                char = char.decode()
+            if char in "\r\n":
+                line, self._line = self._line.strip(), ""
+                if line:
+                    self.write(self.execute(line) + "\n> ")
+                break
+            if len(self._line) < MAX_LINE:
+                self._line += char
+
+    def execute(self, line):
+        """
+        Run a command line.
+
+        Args:
+            line (str): Command name and arguments separated by spaces.
+        Returns:
+            str: The command output.
+        """
+        name, *args = line.split()
+        command = self._commands.get(name)
+        if command is None:
+            return "Unknown command: {}, try help".format(name)
+        try:
+            return command[0](args)
+        except Exception as error:
+            return "Error: {}".format(error)
+
+    def _help(self, args):
+        return "\n".join(
+            "{:<10} {}".format(name, help_text)
+            for name, (_, help_text) in sorted(self._commands.items())
+        )
+
+    def _heap(self, args):
+        if not hasattr(gc, "mem_free"):
+            return "Heap statistics not available"
+        before = gc.mem_free()
+        if args and args[0] == "collect":
+            gc.collect()
+        return "free: {} alloc: {} free after: {}".format(
+            before, gc.mem_alloc(), gc.mem_free()
+        )
+
+    def _timings(self, args):
+        lines = ["name count mean_us max_us | <=100us <=1ms <=10ms <=100ms <=1s >1s"]
+        for name, timing in sorted(self.metrics.timings.items()):
+            if args and not name.startswith(args[0]):
+                continue
+            lines.append(
+                "{} {} {} {} | {}".format(
+                    name,
+                    timing.count,
+                    timing.total_us // timing.count if timing.count else 0,
+                    timing.max_us,
+                    " ".join(str(count) for count in timing.histogram),
+                )
+            )
+        return "\n".join(lines)
+
+    def _counters(self, args):
+        lines = []
+        for values in (self.metrics.counters, self.metrics.gauges):
+            for name, value in sorted(values.items()):
+                if args and not name.startswith(args[0]):
+                    continue
+                lines.append("{} {}".format(name, value))
+        return "\n".join(lines)
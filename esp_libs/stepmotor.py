@@ -1,8 +1,17 @@
 import time
 
-from machine import Pin
+try:
+    from machine import Pin
+except ImportError:
+    # Host machine, the step constants are still usable
+    Pin = None
 
-from .utils import scale_value
+from .fastpath import next_phase
+from .fixedpoint import LinearMap
+
+
+STEPS_PER_TURN = 32 * 64
+DEGREE_TO_STEPS = LinearMap(in_min=0, in_max=360, out_min=0, out_max=STEPS_PER_TURN)
 
 
 class StepMotorDirectionOptions:
@@ -33,6 +42,8 @@ class Stepmotor(object):
         self._B = Pin(B, Pin.OUT, 0)
         self._C = Pin(C, Pin.OUT, 0)
         self._D = Pin(D, Pin.OUT, 0)
+        # Steps done since the motor was created, counter clockwise steps subtract
+        self.position = 0
 
     def _motor_control(self, data):
         """
@@ -41,31 +52,10 @@ class Stepmotor(object):
         Args:
             data: Motor control data.
         """
-        if data == 0x08:
-            self._A.on()
-            self._B.off()
-            self._C.off()
-            self._D.off()
-        if data == 0x04:
-            self._A.off()
-            self._B.on()
-            self._C.off()
-            self._D.off()
-        if data == 0x02:
-            self._A.off()
-            self._B.off()
-            self._C.on()
-            self._D.off()
-        if data == 0x01:
-            self._A.off()
-            self._B.off()
-            self._C.off()
-            self._D.on()
-        if data == 0x00:
-            self._A.off()
-            self._B.off()
-            self._C.off()
-            self._D.off()
+        self._A.value((data >> 3) & 1)
+        self._B.value((data >> 2) & 1)
+        self._C.value((data >> 1) & 1)
+        self._D.value(data & 1)
 
     def move_one_step(self, direction):
         """
@@ -74,18 +64,12 @@ class Stepmotor(object):
         Args:
             direction: Direction of movement (StepMotorDirectionOptions.CLOCKWISE or StepMotorDirectionOptions.COUNTER_CLOCKWISE).
         """
-        if direction == StepMotorDirectionOptions.CLOCKWISE:
-            if self._out != 0x08:
-                self._out = self._out << 1
-            else:
-                self._out = 0x01
-        else:
-            if direction == StepMotorDirectionOptions.COUNTER_CLOCKWISE:
-                if self._out != 0x01:
-                    self._out = self._out >> 1
-                else:
-                    self._out = 0x08
+        self._out = next_phase(self._out, direction)
         self._motor_control(self._out)
+        if direction == StepMotorDirectionOptions.CLOCKWISE:
+            self.position += 1
+        elif direction == StepMotorDirectionOptions.COUNTER_CLOCKWISE:
+            self.position -= 1
 
     def move_steps(self, direction, steps, us=2000):
         """
@@ -110,7 +94,7 @@ class Stepmotor(object):
             us: Delay in microseconds between each step. From 2k to 40k (default: 2000).
         """
         for i in range(turns):
-            self.move_steps(direction, 32 * 64, us)
+            self.move_steps(direction, STEPS_PER_TURN, us)
 
     def move_degree(self, direction, degree, us=2000):
         """
@@ -121,10 +105,7 @@ class Stepmotor(object):
             degree: Angle to move the motor to (0 to 360 degrees).
             us: Delay in microseconds between each step. From 2k to 40k (default: 2000).
         """
-        steps = scale_value(
-            value=degree, in_min=0, in_max=360, out_min=0, out_max=32 * 64
-        )
-        self.move_steps(direction, steps, us)
+        self.move_steps(direction, DEGREE_TO_STEPS.map(degree), us)
 
     def stop(self):
         "After all moviments use this method to turn off the step motor"
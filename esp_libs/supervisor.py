@@ -0,0 +1,306 @@
+try:
+    from machine import reset as machine_reset
+except ImportError:
+    # Host machine, a failed critical task only stops feeding the watchdog
+    machine_reset = None
+
+from .utils import ticks_add, ticks_diff
+
+"""
+Supervisor
+from machine import WDT
+from supervisor import Supervisor
+supervisor = Supervisor(scheduler, wdt=WDT(timeout=10000), metrics=metrics)
+supervisor.watch("zone1_heater", critical=True)
+supervisor.watch("http", critical=False)
+supervisor.start()
+"""
+
+# Default lateness allowed past the period, and longest run of a task
+DEADLINE_MS = 2000
+# Last stalls kept for the status
+STALL_HISTORY = 10
+
+
+class TaskState:
+    OK = "ok"
+    RESTARTING = "restarting"
+    FAILED = "failed"
+
+
+class _Watch:
+    def __init__(self, task, deadline_ms, critical, max_restarts, on_restart, now):
+        self.task = task
+        self.deadline_ms = deadline_ms
+        self.critical = critical
+        self.max_restarts = max_restarts
+        self.on_restart = on_restart
+        self.state = TaskState.OK
+        self.last_beat = now
+        # Supervisor.held_ms at the last heartbeat
+        self.held_ms = 0
+        self.stalled = False
+        self.failures = 0
+        self.restarts = 0
+        self.consecutive_failures = 0
+        self.restart_at = None
+        self.last_error = None
+
+
+class Supervisor:
+    """
+    Watches the scheduler tasks. Every run of a watched task is a heartbeat,
+    and a task without heartbeat for longer than its period plus its
+    deadline is stalled, so the deadline follows a changed period. The time
+    spent in runs of the other watched tasks is not counted: a run longer
+    than its deadline is blamed on the task that ran, not on the ones that
+    waited for it. A task that raises or stalls is disabled and restarted
+    after a growing backoff, and once it runs out of restarts it has failed.
+    The hardware watchdog is only fed while no critical task has failed, so
+    a failed critical task, or a task that hangs the whole loop, resets the
+    board.
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        wdt=None,
+        check_period_ms=1000,
+        backoff_ms=1000,
+        max_backoff_ms=60000,
+        metrics=None,
+        reset=None,
+        is_paused=None,
+    ):
+        """
+        Args:
+            scheduler (Scheduler): Scheduler running the watched tasks.
+            wdt (WDT): Hardware watchdog, fed by the supervisor task (default: None).
+            check_period_ms (int): Period of the supervisor task (default: 1000).
+            backoff_ms (int): Wait before the first restart of a task, doubled
+                on each consecutive failure (default: 1000).
+            max_backoff_ms (int): Longest wait before a restart (default: 60000).
+            metrics (Metrics): Where failures, restarts and stall latencies
+                are recorded (default: None).
+            reset (callable): Called when a critical task failed and there is
+                no watchdog to do it (default: machine.reset).
+            is_paused (callable): Called with a task name, whether the task is
+                stopped on purpose (e.g. PowerManager.is_disabled), its restart
+                then waits until it is not (default: None).
+        """
+        self.scheduler = scheduler
+        self.wdt = wdt
+        self.check_period_ms = check_period_ms
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.metrics = metrics
+        self.reset = reset if reset is not None else machine_reset
+        self.is_paused = is_paused
+        self.healthy = True
+        self.feeds = 0
+        self.stalls = []
+        # Total time spent in runs of watched tasks
+        self.held_ms = 0
+        self._watches = {}
+
+    def _ticks_ms(self):
+        return self.scheduler.clock.ticks_ms()
+
+    def watch(
+        self,
+        name,
+        deadline_ms=DEADLINE_MS,
+        critical=True,
+        max_restarts=3,
+        on_restart=None,
+    ):
+        """
+        Start watching a scheduler task.
+
+        Args:
+            name (str): Name of the task, already added to the scheduler.
+            deadline_ms (int): Longest lateness of a run past its period, and
+                longest duration of a run (default: DEADLINE_MS).
+            critical (bool): Whether the board is reset when the task fails (default: True).
+            max_restarts (int): Consecutive restarts before the task has failed (default: 3).
+            on_restart (callable): Called before the task is enabled again,
+                e.g. to rebuild a device (default: None).
+        """
+        task = self.scheduler.get_task(name)
+        if task is None:
+            raise ValueError("no task named {}".format(name))
+        watch = _Watch(
+            task, deadline_ms, critical, max_restarts, on_restart, self._ticks_ms()
+        )
+        task.callback = self._wrap(watch, task.callback)
+        self._watches[name] = watch
+
+    def _wrap(self, watch, callback):
+        def supervised():
+            start = self._ticks_ms()
+            try:
+                callback()
+            except Exception as error:
+                self._hold(start)
+                self._fail(watch, error)
+                return
+            duration = self._hold(start)
+            if duration > watch.deadline_ms:
+                # the run itself held the loop past the deadline
+                self._record_stall(watch, duration)
+                self._fail(watch, "run took {} ms".format(duration))
+                return
+            self.heartbeat(watch.task.name)
+
+        return supervised
+
+    def _hold(self, start):
+        duration = ticks_diff(self._ticks_ms(), start)
+        self.held_ms += duration
+        return duration
+
+    def _beat(self, watch, now):
+        watch.last_beat = now
+        watch.held_ms = self.held_ms
+
+    def _age(self, watch, now):
+        # time without heartbeat, less the runs of the other tasks since then
+        return ticks_diff(now, watch.last_beat) - (self.held_ms - watch.held_ms)
+
+    def heartbeat(self, name):
+        """
+        Mark a task alive, called after every successful run of a watched task.
+        """
+        watch = self._watches[name]
+        now = self._ticks_ms()
+        if watch.stalled:
+            watch.stalled = False
+            self._record_stall(watch, ticks_diff(now, watch.last_beat))
+        self._beat(watch, now)
+        watch.consecutive_failures = 0
+
+    def _record_stall(self, watch, latency_ms):
+        print(
+            "SUPERVISOR: Task {} stalled for {} ms".format(watch.task.name, latency_ms)
+        )
+        self.stalls.append((watch.task.name, latency_ms))
+        if len(self.stalls) > STALL_HISTORY:
+            self.stalls.pop(0)
+        if self.metrics is not None:
+            self.metrics.time("stall_" + watch.task.name, latency_ms * 1000)
+
+    def _fail(self, watch, error):
+        name = watch.task.name
+        watch.failures += 1
+        watch.consecutive_failures += 1
+        watch.last_error = str(error)
+        watch.task.enabled = False
+        if self.metrics is not None:
+            self.metrics.inc("task_{}_failures".format(name))
+
+        if watch.consecutive_failures > watch.max_restarts:
+            watch.state = TaskState.FAILED
+            print("SUPERVISOR: Task {} failed: {}".format(name, error))
+            return
+
+        backoff = min(
+            self.backoff_ms << (watch.consecutive_failures - 1), self.max_backoff_ms
+        )
+        watch.state = TaskState.RESTARTING
+        watch.restart_at = ticks_add(self._ticks_ms(), backoff)
+        print(
+            "SUPERVISOR: Task {} error: {}, restart in {} ms".format(
+                name, error, backoff
+            )
+        )
+
+    def _restart(self, watch, now):
+        name = watch.task.name
+        watch.restarts += 1
+        if self.metrics is not None:
+            self.metrics.inc("task_{}_restarts".format(name))
+        if watch.on_restart is not None:
+            try:
+                watch.on_restart()
+            except Exception as error:
+                self._fail(watch, error)
+                return
+
+        print("SUPERVISOR: Restart task {}".format(name))
+        watch.state = TaskState.OK
+        watch.task.enabled = True
+        watch.task.next_run = now
+
+    def check(self):
+        """
+        Restart the tasks whose backoff ended, detect the stalled ones and feed
+        the watchdog when every critical task is healthy.
+
+        Returns:
+            bool: Whether every critical task is healthy.
+        """
+        now = self._ticks_ms()
+        healthy = True
+
+        for watch in self._watches.values():
+            if watch.state == TaskState.RESTARTING:
+                if ticks_diff(now, watch.restart_at) >= 0 and not (
+                    self.is_paused is not None and self.is_paused(watch.task.name)
+                ):
+                    self._restart(watch, now)
+            elif watch.state == TaskState.OK:
+                if not watch.task.enabled:
+                    # Idle tasks (e.g. the stepper between egg turns) are
+                    # disabled on purpose, their deadline starts on enable
+                    self._beat(watch, now)
+                elif self._age(watch, now) > watch.task.period_ms + watch.deadline_ms:
+                    watch.stalled = True
+                    self._fail(watch, "deadline missed")
+
+            # a stalled or raising task is restarting, so only running out of
+            # restarts makes it unhealthy
+            if watch.critical and watch.state == TaskState.FAILED:
+                healthy = False
+
+        if healthy:
+            if self.wdt is not None:
+                self.wdt.feed()
+            self.feeds += 1
+        elif self.healthy:
+            print("SUPERVISOR: Critical task unhealthy, watchdog not fed")
+            if self.wdt is None and self.reset is not None:
+                self.reset()
+        self.healthy = healthy
+        return healthy
+
+    def start(self):
+        """
+        Add the supervisor task to the scheduler, after the watched tasks so
+        their heartbeats of the same loop are seen.
+        """
+        if self.wdt is not None:
+            self.wdt.feed()
+        self.scheduler.add_task("supervisor", self.check, self.check_period_ms)
+
+    def status(self):
+        """
+        Returns:
+            dict: State, heartbeat age, failures and restarts of each task.
+        """
+        now = self._ticks_ms()
+        return {
+            "healthy": self.healthy,
+            "tasks": {
+                name: {
+                    "state": watch.state,
+                    "critical": watch.critical,
+                    "heartbeat_age_ms": ticks_diff(now, watch.last_beat),
+                    "deadline_ms": watch.task.period_ms + watch.deadline_ms,
+                    "failures": watch.failures,
+                    "restarts": watch.restarts,
+                    "last_error": watch.last_error,
+                }
+                for name, watch in self._watches.items()
+            },
+            "stalls": list(self.stalls),
+        }
@@ -0,0 +1,298 @@
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+from .utils import ticks_add, ticks_diff, ticks_ms
+
+"""
+Telemetry
+from umqtt.simple import MQTTClient
+from telemetry import SampleQueue, TelemetryPublisher
+publisher = TelemetryPublisher(
+    lambda: MQTTClient("brooder-1", "192.168.0.10"),
+    topic=b"brooder/1/telemetry",
+    fields=("t", "h"),
+    queue=SampleQueue(max_items=20, flash_path="telemetry.q"),
+)
+publisher.add_sample(ticks_ms(), (37.5, 61.0))
+scheduler.add_task("telemetry", publisher.poll, period_ms=1000)
+"""
+
+
+class SampleQueue:
+    """
+    Bounded FIFO of encoded payloads, each stored with its number of
+    samples. When the RAM part is full the oldest payloads are moved to a
+    file in flash, and payloads that do not fit in the file anymore are
+    dropped. The file is read back from an offset and only removed once
+    every payload in it was popped, so a reset while draining sends some
+    payloads twice but loses none.
+    """
+
+    def __init__(self, max_items=20, flash_path=None, max_flash_bytes=16384):
+        """
+        Args:
+            max_items (int): Payloads kept in RAM, and read from flash at once (default: 20).
+            flash_path (str): File for the overflow, RAM only when None (default: None).
+            max_flash_bytes (int): Largest size of the overflow file (default: 16384).
+        """
+        self.max_items = max_items
+        self.flash_path = flash_path
+        self.max_flash_bytes = max_flash_bytes
+        self.dropped = 0
+        self._items = []
+        # Lines read from flash and not popped yet, from _flash_offset
+        self._backlog = []
+        self._flash_offset = 0
+        self._flash_bytes = 0
+        self._flash_items = 0
+        if flash_path is not None:
+            self._load_flash_size()
+
+    def _load_flash_size(self):
+        try:
+            with open(self.flash_path, "rb") as file:
+                for line in file:
+                    self._flash_bytes += len(line)
+                    self._flash_items += 1
+        except OSError:
+            pass
+
+    def __len__(self):
+        return self._flash_items + len(self._items)
+
+    def push(self, payload, samples=1):
+        """
+        Args:
+            payload (bytes): Encoded payload, without new lines.
+            samples (int): Number of samples in the payload (default: 1).
+        """
+        self._items.append(str(samples).encode() + b" " + payload)
+        if len(self._items) > self.max_items:
+            self._spill(self._items.pop(0))
+
+    def _spill(self, item):
+        if (
+            self.flash_path is None
+            or self._flash_bytes + len(item) + 1 > self.max_flash_bytes
+        ):
+            self.dropped += 1
+            return
+        try:
+            with open(self.flash_path, "ab") as file:
+                file.write(item + b"\n")
+            self._flash_bytes += len(item) + 1
+            self._flash_items += 1
+        except OSError:
+            self.dropped += 1
+
+    def _load_backlog(self):
+        try:
+            with open(self.flash_path, "rb") as file:
+                file.seek(self._flash_offset)
+                while len(self._backlog) < self.max_items:
+                    line = file.readline()
+                    if not line:
+                        break
+                    self._backlog.append(line)
+        except OSError:
+            pass
+        if not self._backlog:
+            # the file is gone or shorter than counted
+            self._remove_flash()
+
+    def _remove_flash(self):
+        try:
+            import os
+
+            os.remove(self.flash_path)
+        except OSError:
+            pass
+        self._backlog = []
+        self._flash_offset = 0
+        self._flash_bytes = 0
+        self._flash_items = 0
+
+    def peek(self):
+        """
+        Returns:
+            tuple: The oldest payload (bytes) and its number of samples,
+            None when empty.
+        """
+        if not self._backlog and self._flash_items:
+            self._load_backlog()
+        if self._backlog:
+            item = self._backlog[0].rstrip(b"\n")
+        elif self._items:
+            item = self._items[0]
+        else:
+            return None
+        samples, payload = item.split(b" ", 1)
+        return payload, int(samples)
+
+    def pop(self):
+        """
+        Remove the payload returned by the last peek().
+        """
+        if self._backlog:
+            self._flash_offset += len(self._backlog.pop(0))
+            self._flash_items -= 1
+            if self._flash_items <= 0:
+                self._remove_flash()
+        elif self._items:
+            self._items.pop(0)
+
+
+class TelemetryPublisher:
+    """
+    Batches samples into compact JSON payloads and publishes them over MQTT
+    from a scheduler task. Payloads wait in the queue while the broker is
+    not reachable and are drained a few per poll after reconnecting, so a
+    long outage does not turn into a burst that stalls the loop.
+    """
+
+    def __init__(
+        self,
+        client_factory,
+        topic,
+        fields,
+        queue=None,
+        batch_size=10,
+        max_batch_age_ms=60000,
+        max_publish_per_poll=5,
+        reconnect_ms=5000,
+        max_reconnect_ms=300000,
+        socket_timeout_ms=1000,
+        metrics=None,
+    ):
+        """
+        Args:
+            client_factory (callable): Returns an MQTTClient like object with
+                connect(timeout=seconds), publish(topic, msg) and disconnect().
+            topic (bytes): Topic of the payloads.
+            fields (tuple): Names of the values of each sample.
+            queue (SampleQueue): Queue of the payloads (default: RAM only queue).
+            batch_size (int): Samples per payload (default: 10).
+            max_batch_age_ms (int): Publish a partial batch after this time (default: 60000).
+            max_publish_per_poll (int): Payloads sent on each poll (default: 5).
+            reconnect_ms (int): First wait between reconnections (default: 5000).
+            max_reconnect_ms (int): Longest wait between reconnections (default: 300000).
+            socket_timeout_ms (int): Longest blocking connect or publish, keep
+                it well under the deadline of the scheduler tasks (default: 1000).
+            metrics (Metrics): Where throughput and queue depth are recorded (default: None).
+        """
+        self.client_factory = client_factory
+        self.topic = topic
+        self.fields = fields
+        self.queue = queue if queue is not None else SampleQueue()
+        self.batch_size = batch_size
+        self.max_batch_age_ms = max_batch_age_ms
+        self.max_publish_per_poll = max_publish_per_poll
+        self.reconnect_ms = reconnect_ms
+        self.max_reconnect_ms = max_reconnect_ms
+        self.socket_timeout_ms = socket_timeout_ms
+        self.metrics = metrics
+
+        self.published_payloads = 0
+        self.published_samples = 0
+        self.errors = 0
+
+        self._client = None
+        self._next_connect = ticks_ms()
+        self._reconnect_wait = reconnect_ms
+        self._batch = []
+        self._batch_start = None
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def add_sample(self, timestamp_ms, values):
+        """
+        Add a sample to the current batch. Cheap and never touches the
+        network.
+
+        Args:
+            timestamp_ms (int): Ticks of the sample in milliseconds.
+            values (tuple): One value per field.
+        """
+        if self._batch_start is None:
+            self._batch_start = timestamp_ms
+        self._batch.append([ticks_diff(timestamp_ms, self._batch_start)] + list(values))
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+
+    def _flush_batch(self):
+        payload = json.dumps(
+            {
+                "t0": self._batch_start,
+                "f": ["dt"] + list(self.fields),
+                "d": self._batch,
+            }
+        )
+        self.queue.push(payload.encode(), len(self._batch))
+        self._batch = []
+        self._batch_start = None
+
+    def _connect(self, now):
+        if ticks_diff(now, self._next_connect) < 0:
+            return False
+        # umqtt raises MQTTException, not an OSError, when the broker refuses
+        # the connection
+        try:
+            client = self.client_factory()
+            client.connect(timeout=self.socket_timeout_ms / 1000)
+        except Exception as error:
+            print("TELEMETRY: Connection failed: {}".format(error))
+            self.errors += 1
+            self._next_connect = ticks_add(now, self._reconnect_wait)
+            self._reconnect_wait = min(self._reconnect_wait * 2, self.max_reconnect_ms)
+            return False
+
+        self._client = client
+        self._reconnect_wait = self.reconnect_ms
+        return True
+
+    def _disconnect(self, now):
+        try:
+            self._client.disconnect()
+        except Exception:
+            pass
+        self._client = None
+        self._next_connect = ticks_add(now, self._reconnect_wait)
+
+    def poll(self):
+        """
+        Flush an old partial batch, reconnect when needed and publish up to
+        max_publish_per_poll payloads.
+        """
+        now = ticks_ms()
+
+        if self._batch and ticks_diff(now, self._batch_start) >= self.max_batch_age_ms:
+            self._flush_batch()
+
+        if len(self.queue) and (self._client is not None or self._connect(now)):
+            for _ in range(self.max_publish_per_poll):
+                item = self.queue.peek()
+                if item is None:
+                    break
+                payload, samples = item
+                try:
+                    self._client.publish(self.topic, payload)
+                except Exception as error:
+                    print("TELEMETRY: Publish failed: {}".format(error))
+                    self.errors += 1
+                    self._disconnect(now)
+                    break
+                self.queue.pop()
+                self.published_payloads += 1
+                self.published_samples += samples
+
+        if self.metrics is not None:
+            self.metrics.set("telemetry_queue_depth", len(self.queue))
+            self.metrics.set("telemetry_published_payloads", self.published_payloads)
+            self.metrics.set("telemetry_published_samples", self.published_samples)
+            self.metrics.set("telemetry_dropped_payloads", self.queue.dropped)
+            self.metrics.set("telemetry_errors", self.errors)
+            self.metrics.set("telemetry_connected", 1 if self.connected else 0)
@@ -1,8 +1,10 @@
-import math
+try:
+    from machine import ADC, Pin
+except ImportError:
+    # Host machine, only usable with an injected adc (e.g. trace replay)
+    ADC = Pin = None
 
-from machine import ADC, Pin
-
-from .utils import scale_value
+from .fastpath import adc_to_celsius
 
 """
 Thermistor
@@ -15,15 +17,22 @@ print(thermistor.get_temperature())
 class Thermistor:
     adc = None
 
-    def __init__(self, pin: int):
+    def __init__(self, pin: int = None, adc=None):
+        """
+        Args:
+            pin (int): ADC pin of the thermistor divider.
+            adc: Object with read() returning the 12 bit reading, used instead
+                of the pin when given (default: None).
+        """
+        if adc is not None:
+            self.adc = adc
+            return
+
         self.adc = ADC(Pin(pin))
         self.adc.atten(ADC.ATTN_11DB)
         self.adc.width(ADC.WIDTH_12BIT)
 
     def get_temperature(self):
-        adc_value = self.adc.read()
-        voltage = adc_value / 4095 * 3.3
-        rt = 10 * voltage / (3.3 - voltage)
-        temp_k = 1 / (1 / (273.15 + 25) + (math.log(rt / 10)) / 3950)
-        temp_c = temp_k - 273.15
-        return temp_c
+        # rt / 10k is the ratio of the two voltages of the divider, so the
+        # raw ADC value is converted directly
+        return adc_to_celsius(self.adc.read())
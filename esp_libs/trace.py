@@ -0,0 +1,296 @@
+import struct
+
+from .utils import ticks_diff, ticks_ms
+
+"""
+Trace
+Record on the device:
+from trace import TraceRecorder
+recorder = TraceRecorder("trace.bin")
+recorder.attach_thermistor(thermistor, channel=0)
+recorder.attach_hygrothermograph(hygrothermograph, channel=1)
+scheduler.add_task("trace", recorder.flush, period_ms=10000)
+
+Replay on a host:
+from trace import TraceReplay
+replay = TraceReplay("trace.bin", clock)
+thermistor = Thermistor(adc=replay.adc(channel=0))
+hygrothermograph = Hygrothermograph(dht=replay.dht(channel=1))
+scheduler.run_until(replay.duration_ms)
+"""
+
+MAGIC = b"BRT1"
+
+# Record: time since the previous record in ms, channel, value
+RECORD_FORMAT = "<HBh"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+MAX_DELTA_MS = 0xFFFF
+# Channel of the records that only move the time forward
+CHANNEL_SKIP = 0xFF
+
+# Each sensor uses 1 (thermistor) or 2 (hygrothermograph) channels from its
+# channel number: the raw ADC reading, or the DHT temperature and humidity
+# multiplied by DHT_SCALE
+KIND_ADC = 0
+KIND_DHT_TEMPERATURE = 1
+KIND_DHT_HUMIDITY = 2
+DHT_SCALE = 10
+# Value recorded when reading the sensor raised, raised again on replay
+ERROR_VALUE = -32768
+
+
+def _record_channel(channel, kind):
+    return channel * 4 + kind
+
+
+class TraceWriter:
+    """
+    Writes records to a binary trace file, buffered in RAM and flushed on
+    request. Stops writing once the file reaches max_bytes.
+    """
+
+    def __init__(self, path, max_bytes=262144, clock=None):
+        """
+        Args:
+            path (str): Trace file, overwritten.
+            max_bytes (int): Largest size of the file (default: 262144).
+            clock: Object with ticks_ms(), the system ticks when None (default: None).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = len(MAGIC)
+        self.full = False
+        self._buffer = bytearray()
+        self._last_ms = None
+        with open(path, "wb") as file:
+            file.write(MAGIC)
+
+    def _ticks_ms(self):
+        return self.clock.ticks_ms() if self.clock is not None else ticks_ms()
+
+    def write(self, channel, value):
+        """
+        Args:
+            channel (int): Record channel, 0 to 254.
+            value (int): Value, -32768 to 32767.
+        """
+        if self.full:
+            return
+
+        now = self._ticks_ms()
+        delta = 0 if self._last_ms is None else ticks_diff(now, self._last_ms)
+        self._last_ms = now
+
+        while delta > MAX_DELTA_MS:
+            self._append(MAX_DELTA_MS, CHANNEL_SKIP, 0)
+            delta -= MAX_DELTA_MS
+        self._append(delta, channel, value)
+
+    def _append(self, delta, channel, value):
+        if self.size + RECORD_SIZE > self.max_bytes:
+            self.full = True
+            return
+        self._buffer += struct.pack(RECORD_FORMAT, delta, channel, value)
+        self.size += RECORD_SIZE
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with open(self.path, "ab") as file:
+            file.write(self._buffer)
+        self._buffer = bytearray()
+
+
+def read_trace(path):
+    """
+    Read a trace file.
+
+    Args:
+        path (str): Trace file.
+    Returns:
+        list: (time_ms, channel, value) tuples, time from the first record.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if data[: len(MAGIC)] != MAGIC:
+        raise ValueError("not a trace file: {}".format(path))
+
+    records = []
+    now = 0
+    for offset in range(len(MAGIC), len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        delta, channel, value = struct.unpack_from(RECORD_FORMAT, data, offset)
+        now += delta
+        if channel != CHANNEL_SKIP:
+            records.append((now, channel, value))
+    return records
+
+
+class _RecordingADC:
+    def __init__(self, adc, writer, channel):
+        self._adc = adc
+        self._writer = writer
+        self._channel = channel
+
+    def read(self):
+        try:
+            value = self._adc.read()
+        except Exception:
+            self._writer.write(self._channel, ERROR_VALUE)
+            raise
+        self._writer.write(self._channel, value)
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._adc, name)
+
+
+class _RecordingDHT:
+    def __init__(self, dht, writer, channel):
+        self._dht = dht
+        self._writer = writer
+        self._channel = channel
+
+    def measure(self):
+        try:
+            self._dht.measure()
+        except Exception:
+            self._writer.write(self._channel + KIND_DHT_TEMPERATURE, ERROR_VALUE)
+            self._writer.write(self._channel + KIND_DHT_HUMIDITY, ERROR_VALUE)
+            raise
+        self._writer.write(
+            self._channel + KIND_DHT_TEMPERATURE,
+            int(self._dht.temperature() * DHT_SCALE),
+        )
+        self._writer.write(
+            self._channel + KIND_DHT_HUMIDITY, int(self._dht.humidity() * DHT_SCALE)
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._dht, name)
+
+
+class TraceRecorder:
+    """
+    Records every raw reading of the attached sensors while the drivers keep
+    working as usual.
+    """
+
+    def __init__(self, path, max_bytes=262144, clock=None):
+        """
+        Args:
+            path (str): Trace file, overwritten.
+            max_bytes (int): Largest size of the file (default: 262144).
+            clock: Object with ticks_ms(), the system ticks when None (default: None).
+        """
+        self.writer = TraceWriter(path, max_bytes, clock)
+
+    def attach_thermistor(self, thermistor, channel):
+        thermistor.adc = _RecordingADC(
+            thermistor.adc, self.writer, _record_channel(channel, KIND_ADC)
+        )
+
+    def attach_hygrothermograph(self, hygrothermograph, channel):
+        hygrothermograph.dht = _RecordingDHT(
+            hygrothermograph.dht, self.writer, _record_channel(channel, 0)
+        )
+
+    def flush(self):
+        self.writer.flush()
+
+
+class _ReplayChannel:
+    """
+    Value of a channel at the current clock time: the last record at or
+    before it.
+    """
+
+    def __init__(self, records, clock):
+        self._records = records
+        self._clock = clock
+        self._index = 0
+
+    def value(self):
+        now = self._clock.ticks_ms()
+        while (
+            self._index + 1 < len(self._records)
+            and self._records[self._index + 1][0] <= now
+        ):
+            self._index += 1
+        if not self._records or self._records[self._index][0] > now:
+            raise OSError("no trace value yet")
+        return self._records[self._index][1]
+
+
+class _ReplayADC:
+    def __init__(self, channel):
+        self._channel = channel
+
+    def read(self):
+        value = self._channel.value()
+        if value == ERROR_VALUE:
+            raise OSError("recorded ADC error")
+        return value
+
+
+class _ReplayDHT:
+    def __init__(self, temperature, humidity):
+        self._temperature = temperature
+        self._humidity = humidity
+
+    def measure(self):
+        if self._temperature.value() == ERROR_VALUE:
+            raise OSError("recorded DHT error")
+
+    def temperature(self):
+        return self._temperature.value() / DHT_SCALE
+
+    def humidity(self):
+        return self._humidity.value() / DHT_SCALE
+
+
+class TraceReplay:
+    """
+    Feeds a recorded trace back to the drivers. The readings follow the
+    given clock, so with a VirtualClock a trace of days is replayed as fast
+    as the CPU allows.
+    """
+
+    def __init__(self, path, clock, start_ms=None):
+        """
+        Args:
+            path (str): Trace file.
+            clock: Object with ticks_ms(), e.g. the scheduler VirtualClock.
+            start_ms (int): Clock ticks of the first record (default: the
+                current clock ticks).
+        """
+        self.clock = clock
+        self.start_ms = clock.ticks_ms() if start_ms is None else start_ms
+        self._channels = {}
+        self.duration_ms = 0
+
+        for time_ms, channel, value in read_trace(path):
+            self._channels.setdefault(channel, []).append(
+                (self.start_ms + time_ms, value)
+            )
+            self.duration_ms = time_ms
+
+    def _channel(self, channel):
+        return _ReplayChannel(self._channels.get(channel, []), self.clock)
+
+    def adc(self, channel):
+        """
+        Returns:
+            ADC like object for Thermistor(adc=...).
+        """
+        return _ReplayADC(self._channel(_record_channel(channel, KIND_ADC)))
+
+    def dht(self, channel):
+        """
+        Returns:
+            DHT like object for Hygrothermograph(dht=...).
+        """
+        return _ReplayDHT(
+            self._channel(_record_channel(channel, KIND_DHT_TEMPERATURE)),
+            self._channel(_record_channel(channel, KIND_DHT_HUMIDITY)),
+        )
@@ -1,3 +1,25 @@
+try:
+    from time import sleep_ms, ticks_add, ticks_diff, ticks_ms, ticks_us
+except ImportError:
+    # CPython fallback, used when the libs run on a host machine
+    import time
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_us():
+        return int(time.monotonic() * 1000000)
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+
 def scale_value(
     value: float, in_min: float, in_max: float, out_min: float, out_max: float
 ):
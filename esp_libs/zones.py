@@ -0,0 +1,379 @@
+import time
+
+from .fusion import TemperatureEstimator
+from .pid import PID, TimeProportionalOutput
+from .stepmotor import DEGREE_TO_STEPS, StepMotorDirectionOptions
+from .utils import ticks_ms
+
+"""
+Zones
+from zones import Zone, ZoneController
+zone = Zone("zone1", thermistor=Thermistor(pin=36), relay=Pin(2, Pin.OUT))
+ZoneController(scheduler, [zone])
+scheduler.run_forever()
+"""
+
+# Samples between two history points, one point per minute at 1 Hz
+HISTORY_INTERVAL = 60
+HISTORY_SIZE = 16
+
+# Steps done by each run of the egg turning task, 8 steps * 2 ms
+STEPS_PER_RUN = 8
+
+
+class Zone:
+    """
+    One independently controlled area of the cabinet: its sensors and
+    actuators, setpoints and egg turning schedule. The methods do one short
+    piece of work each, and are called periodically by the ZoneController.
+    Devices that the zone does not have are None.
+    """
+
+    def __init__(
+        self,
+        name,
+        thermistor,
+        relay,
+        hygrothermograph=None,
+        servo=None,
+        stepmotor=None,
+        setpoint=37.5,
+        min_humidity=60,
+        max_humidity=70,
+        turn_interval_s=3600,
+        turn_degree=180,
+        final_day=24,
+        pid_tunings=(0.5, 0.01, 2.0),
+        heater_window_ms=120000,
+        heater_min_on_ms=10000,
+        heater_min_off_ms=10000,
+        metrics=None,
+        clock=None,
+    ):
+        """
+        Args:
+            name (str): Zone name, used as prefix of the task and metric names.
+            thermistor (Thermistor): Temperature sensor.
+            relay (Pin): Relay of the lights, value 0 turns them on.
+            hygrothermograph (Hygrothermograph): Humidity sensor (default: None).
+            servo (Servo): Servo of the extractor fan (default: None).
+            stepmotor (Stepmotor): Step motor that turns the eggs (default: None).
+            setpoint (float): Desired temperature (default: 37.5).
+            min_humidity (float): Humidity with the extractor fan closed (default: 60).
+            max_humidity (float): Humidity with the extractor fan open (default: 70).
+            turn_interval_s (int): Time between egg turns (default: 3600).
+            turn_degree (int): Step motor degrees of each turn (default: 180).
+            final_day (int): Incubation length in days, turning stops 3 days before (default: 24).
+            pid_tunings (tuple): kp, ki and kd of the heater (default: (0.5, 0.01, 2.0)).
+            heater_window_ms (int): Time proportional window of the heater
+                relay, at most one on/off cycle per window (default: 120000).
+            heater_min_on_ms (int): Shortest time the heater relay stays on (default: 10000).
+            heater_min_off_ms (int): Shortest time the heater relay stays off (default: 10000).
+            metrics (Metrics): Where the sensor errors are counted (default: None).
+            clock: Object with ticks_ms() and time(), e.g. a scheduler clock,
+                used by the heater control, the temperature estimator and the
+                egg turning schedule, the system time when None (default: None).
+        """
+        self.name = name
+        self.thermistor = thermistor
+        self.hygrothermograph = hygrothermograph
+        self.servo = servo
+        self.stepmotor = stepmotor
+        self.min_humidity = min_humidity
+        self.max_humidity = max_humidity
+        self.turn_interval_s = turn_interval_s
+        self.turn_degree = turn_degree
+        self.final_day = final_day
+        self.metrics = metrics
+        self.clock = clock
+        self.start_time = self._time()
+
+        # temperature is the thermistor fused with the hygrothermograph, the
+        # raw thermistor reading is kept for diagnostics
+        self.estimator = TemperatureEstimator()
+        self.temperature = None
+        self.raw_temperature = None
+        self.temperature_rate = 0.0
+        self.humidity = None
+        self.last_10_temperatures = []
+        self.temperature_min = None
+        self.temperature_max = None
+        self.humidity_min = None
+        self.humidity_max = None
+        self.temperature_history = []
+        self.humidity_history = []
+        self._history_count = 0
+
+        self.heater_pid = PID(*pid_tunings, setpoint=setpoint, sample_time_ms=1000)
+        # Relay value 0 uses the NC state, TURNING ON the lights
+        self.heater_output = TimeProportionalOutput(
+            relay,
+            window_ms=heater_window_ms,
+            min_on_ms=heater_min_on_ms,
+            min_off_ms=heater_min_off_ms,
+            on_value=0,
+        )
+
+        self.extractor_fan_position = None
+        self.servo_task = None
+
+        self.egg_turns = 0
+        self.last_egg_turn = self.start_time
+        self.turning = False
+        self.stepper_task = None
+        self._remaining_steps = 0
+
+    def _error(self, sensor):
+        print("ZONE {}: {} sensor not found".format(self.name, sensor))
+        if self.metrics is not None:
+            self.metrics.inc("{}_{}_sensor_errors".format(self.name, sensor))
+
+    def _ticks_ms(self):
+        return self.clock.ticks_ms() if self.clock is not None else ticks_ms()
+
+    def _time(self):
+        return self.clock.time() if self.clock is not None else time.time()
+
+    def day(self):
+        """
+        Returns:
+            int: Days since the zone started.
+        """
+        return (self._time() - self.start_time) // (24 * 3600)
+
+    def sample_temperature(self):
+        try:
+            temperature = self.thermistor.get_temperature()
+        except Exception:
+            temperature = None
+        if not isinstance(temperature, float):
+            temperature = None
+            self._error("temperature")
+
+        self.raw_temperature = temperature
+        if temperature is not None:
+            temperature = self.estimator.update_fast(temperature, self._ticks_ms())
+        self.temperature = temperature
+        self.temperature_rate = self.estimator.rate
+
+        if temperature is not None:
+            self.last_10_temperatures.append(temperature)
+            # Keep only the last 10 temperatures
+            if len(self.last_10_temperatures) > 10:
+                self.last_10_temperatures.pop(0)
+
+            if self.temperature_min is None or temperature < self.temperature_min:
+                self.temperature_min = temperature
+            if self.temperature_max is None or temperature > self.temperature_max:
+                self.temperature_max = temperature
+
+        self._history_count += 1
+        if self._history_count >= HISTORY_INTERVAL:
+            self._history_count = 0
+            self.temperature_history.append(
+                sum(self.last_10_temperatures) / len(self.last_10_temperatures)
+                if self.last_10_temperatures
+                else None
+            )
+            self.humidity_history.append(self.humidity)
+
+            if len(self.temperature_history) > HISTORY_SIZE:
+                self.temperature_history.pop(0)
+                self.humidity_history.pop(0)
+
+    def sample_humidity(self):
+        try:
+            temperature, self.humidity = (
+                self.hygrothermograph.get_temperature_and_humidity()
+            )
+        except Exception:
+            self.humidity = None
+            self._error("humidity")
+            return
+
+        # the calibrated DHT temperature corrects the thermistor offset
+        calibrated = self.estimator.calibrated
+        self.estimator.update_reference(temperature, self._ticks_ms())
+        if not calibrated and self.estimator.calibrated:
+            # the first reading moves the estimate by the whole offset at once,
+            # what was computed from the uncalibrated thermistor is dropped
+            self.temperature = self.estimator.temperature
+            self.last_10_temperatures = [self.temperature]
+            self.temperature_min = self.temperature
+            self.temperature_max = self.temperature
+            self.temperature_history = []
+            self.humidity_history = []
+            self._history_count = 0
+            self.heater_pid.reset()
+
+        if self.humidity_min is None or self.humidity < self.humidity_min:
+            self.humidity_min = self.humidity
+        if self.humidity_max is None or self.humidity > self.humidity_max:
+            self.humidity_max = self.humidity
+
+    def control_heater(self):
+        now = self._ticks_ms()
+        self.heater_output.update(self.heater_pid.compute(self.temperature, now), now)
+
+    def control_extractor_fan(self):
+        if self.humidity is not None:
+            # open the exaustor fan proportionally to the humidity
+            position = int(
+                ((self.humidity - self.min_humidity) / (self.max_humidity - self.min_humidity))
+                * (0 - 50)
+                + 50
+            )
+            # 0 is full open and 50 full close
+            position = max(min(position, 50), 0)
+        else:
+            position = 50
+
+        if position != self.extractor_fan_position:
+            print(
+                "ZONE {}: Servo position: {}, humidity: {}".format(
+                    self.name, position, self.humidity
+                )
+            )
+        self.extractor_fan_position = position
+        if self.servo_task is not None:
+            self.servo_task.enabled = True
+
+    def move_servo(self):
+        """
+        Move the extractor fan one degree, the task stops itself at the target.
+        """
+        if self.servo.step_toward(self.extractor_fan_position):
+            self.servo_task.enabled = False
+
+    def turn_eggs(self, now=None, force=False):
+        """
+        Start an egg turn when it is due, until 3 days before the final day.
+
+        Args:
+            now (int): Current time in seconds (default: the clock time).
+            force (bool): Turn now, ignoring the schedule (default: False).
+        Returns:
+            bool: True when a turn was started.
+        """
+        if now is None:
+            now = self._time()
+        if self.turning or self.stepmotor is None:
+            return False
+        if not force:
+            if now - self.last_egg_turn < self.turn_interval_s:
+                return False
+            if self.day() + 3 >= self.final_day:
+                return False
+
+        self.last_egg_turn = now
+        self.turning = True
+        self._remaining_steps = DEGREE_TO_STEPS.map(self.turn_degree)
+        if self.stepper_task is not None:
+            self.stepper_task.enabled = True
+        return True
+
+    def move_stepper(self):
+        """
+        Do a few steps of the current egg turn, the task stops itself at the end.
+        """
+        steps = min(self._remaining_steps, STEPS_PER_RUN)
+        self.stepmotor.move_steps(StepMotorDirectionOptions.CLOCKWISE, steps)
+        self._remaining_steps -= steps
+
+        if self._remaining_steps <= 0:
+            self.stepmotor.stop()
+            self.turning = False
+            self.egg_turns += 1
+            self.stepper_task.enabled = False
+
+    def next_turn_s(self):
+        """
+        Returns:
+            int: Seconds until the next egg turn, None when turning is over.
+        """
+        if self.stepmotor is None or self.day() + 3 >= self.final_day:
+            return None
+        return max(self.turn_interval_s - (self._time() - self.last_egg_turn), 0)
+
+    def status(self):
+        """
+        Returns:
+            dict: The current values of the zone.
+        """
+        return {
+            "name": self.name,
+            "temperature": self.temperature,
+            "temperature_rate_per_min": self.temperature_rate * 60,
+            "humidity": self.humidity,
+            "day": self.day(),
+            "final_day": self.final_day,
+            "lamp_on": self.heater_output.is_on,
+            "heater": self.heater_pid.stats(),
+            "estimator": self.estimator.stats(),
+            "extractor_fan_position": self.extractor_fan_position,
+            "egg_turns": self.egg_turns,
+        }
+
+
+class ZoneController:
+    """
+    Adds the tasks of every zone to one scheduler, so the number of tasks
+    grows linearly with the zones and no thread is needed.
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        zones,
+        temperature_period_ms=1000,
+        humidity_period_ms=2000,
+        heater_period_ms=100,
+        extractor_fan_period_ms=10000,
+    ):
+        """
+        Args:
+            scheduler (Scheduler): Scheduler that runs the tasks.
+            zones (list): The zones.
+            temperature_period_ms (int): Thermistor sampling period (default: 1000).
+            humidity_period_ms (int): Hygrothermograph sampling period (default: 2000).
+            heater_period_ms (int): Relay update period (default: 100).
+            extractor_fan_period_ms (int): Extractor fan update period (default: 10000).
+        """
+        self.scheduler = scheduler
+        self.zones = zones
+
+        for zone in zones:
+            scheduler.add_task(
+                zone.name + "_temperature", zone.sample_temperature, temperature_period_ms
+            )
+            scheduler.add_task(zone.name + "_heater", zone.control_heater, heater_period_ms)
+
+            if zone.hygrothermograph is not None:
+                scheduler.add_task(
+                    zone.name + "_humidity", zone.sample_humidity, humidity_period_ms
+                )
+
+            if zone.servo is not None:
+                scheduler.add_task(
+                    zone.name + "_extractor_fan",
+                    zone.control_extractor_fan,
+                    extractor_fan_period_ms,
+                    delay_ms=extractor_fan_period_ms,
+                )
+                zone.servo_task = scheduler.add_task(
+                    zone.name + "_servo", zone.move_servo, 10
+                )
+                zone.servo_task.enabled = False
+
+            if zone.stepmotor is not None:
+                scheduler.add_task(zone.name + "_turn", zone.turn_eggs, 60000)
+                zone.stepper_task = scheduler.add_task(
+                    zone.name + "_stepper", zone.move_stepper, 20
+                )
+                zone.stepper_task.enabled = False
+
+    def get_zone(self, name):
+        for zone in self.zones:
+            if zone.name == name:
+                return zone
+        return None
@@ -1,41 +1,211 @@
-import _thread
-import time
+import gc
+
+try:
+    import ujson as json
+except ImportError:
+    import json
 
 import utime
-from machine import Pin
+from machine import WDT, Pin, SoftI2C, reset_cause
 
+from esp_libs.button import Button
+from esp_libs.http_server import CONTENT_TYPE_TEXT, StatusServer
 from esp_libs.hygrothermograph import Hygrothermograph
 from esp_libs.lcd import I2cLcd
+from esp_libs.lcd_glyphs import GlyphCache, GraphRenderer
+from esp_libs.lcd_views import LcdViewManager
+from esp_libs.metrics import Metrics
+from esp_libs.power import PowerClock, PowerManager, PowerMode
+from esp_libs.registry import DeviceRegistry
+from esp_libs.scheduler import Scheduler
 from esp_libs.servo import Servo
-from esp_libs.stepmotor import Stepmotor, StepMotorDirectionOptions
+from esp_libs.shell import DiagnosticShell
+from esp_libs.stepmotor import Stepmotor
+from esp_libs.supervisor import Supervisor
+from esp_libs.telemetry import SampleQueue, TelemetryPublisher
 from esp_libs.thermistor import Thermistor
+from esp_libs.trace import TraceRecorder
+from esp_libs.zones import HISTORY_INTERVAL, Zone, ZoneController
 
 # CONSTANTS
 START_DATE = utime.localtime()
+HTTP_PORT = 80
+# telemetry is only published when a broker is set
+MQTT_BROKER = None
+MQTT_CLIENT_ID = "brooder"
+MQTT_TOPIC = b"brooder/telemetry"
+# the board resets when the loop hangs for this long or a critical task fails
+WDT_TIMEOUT_MS = 10000
+# input reading 1 while the mains power is present, an RTC GPIO so it wakes
+# the board from light sleep, the low power mode is only entered from the
+# shell when None
+POWER_SENSE_PIN = None
+# light sleep is held off this long after each shell input, the first
+# characters typed while asleep are lost
+SHELL_AWAKE_MS = 30000
+BATTERY_MAH = 2000
+# current of the LCD backlight, for the battery time estimate
+BACKLIGHT_MA = 20
+# raw sensor readings are recorded for a host replay when a path is set
+TRACE_PATH = None
+TRACE_MAX_BYTES = 262144
+# zones of the cabinet, replaced by the content of ZONES_CONFIG_PATH when
+# that file exists. Only "name", "thermistor_pin" and "relay_pin" are required.
+ZONES_CONFIG_PATH = "zones.json"
+ZONES_CONFIG = [
+    {
+        "name": "zone1",
+        "thermistor_pin": 36,
+        "relay_pin": 2,
+        "dht_pin": 18,
+        "servo_pin": 12,
+        "stepper_pins": [33, 25, 26, 27],
+        "setpoint": 37.5,
+        "min_humidity": 60,
+        "max_humidity": 70,
+        "turn_interval_s": 3600,
+        "final_day": 24,
+    },
+]
 
 # GLOBAL VARIABLES
-temperature = None
-last_10_temperatures = []
-humidity = None
 current_date = None
-final_date = 24
+zones = []
+# loop timings and sensor error counters
+metrics = Metrics()
+# MQTT telemetry, None when no broker is configured
+telemetry_publisher = None
+# zone summary rendered with the HTTP responses, shown by the shell
+rendered_status = ""
 
 # DEVICES
-# step motor to move the eggs
-egg_movement_step_motor = Stepmotor(A=33, B=25, C=26, D=27)
-# servo to open and close the extractor fan
-extractor_fan_servo = Servo(pin_number=12, max_degree=180, freq=50, init_duty=0)
-extractor_fan_servo.set_degree(degree=25)
-# device to get temperature and humidity
-hygrothermograph_device = Hygrothermograph(data_pin=18)
+# the sensors and the relays are built before the loop starts. The servo
+# and the step motor are built on their first move, and the LCD and its
+# button by the first run of the "lcd" task, so the sensors are sampled
+# before the slower initializations
+device_registry = DeviceRegistry()
+# start position of the extractor fan, reached one degree per servo run
+EXTRACTOR_FAN_START_DEGREE = 25
+
+
+def _build_extractor_fan_servo(pin):
+    return Servo(pin_number=pin, max_degree=180, freq=50, init_duty=0)
+
+
+def _build_lcd():
+    i2c = SoftI2C(scl=Pin(14), sda=Pin(13))
+    return I2cLcd(i2c=i2c, i2c_addr=device_registry.i2c_address("lcd", i2c))
+
+
 # display to show temperatura, humidity and time
-lcd_device = I2cLcd(scl_pin=14, sda_pin=13)
-# thermistor
-thermistor_device = Thermistor(pin=36)
-# relay to control the lights
-lamp_relay = Pin(2, Pin.OUT)
+device_registry.register("lcd_device", _build_lcd)
 # lcd button
-lcd_light_button = Pin(15, Pin.IN, Pin.PULL_UP)
+device_registry.register(
+    "lcd_light_button", lambda: Pin(15, Pin.IN, Pin.PULL_UP)
+)
+
+
+def load_zones_config():
+    """
+    Read the zones from ZONES_CONFIG_PATH, or use ZONES_CONFIG.
+
+    Returns:
+        list: One dict per zone.
+    """
+    try:
+        with open(ZONES_CONFIG_PATH) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return ZONES_CONFIG
+
+
+def register_zone_devices(config):
+    """
+    Register the devices of a zone, named "<zone>_<device>".
+
+    Args:
+        config (dict): The zone configuration.
+
+    Returns:
+        None
+    """
+    name = config["name"]
+
+    device_registry.register(
+        name + "_thermistor", lambda: Thermistor(pin=config["thermistor_pin"])
+    )
+    # relay to control the lights
+    device_registry.register(
+        name + "_lamp_relay", lambda: Pin(config["relay_pin"], Pin.OUT)
+    )
+    if "dht_pin" in config:
+        device_registry.register(
+            name + "_hygrothermograph",
+            lambda: Hygrothermograph(data_pin=config["dht_pin"]),
+        )
+    if "servo_pin" in config:
+        # servo to open and close the extractor fan
+        device_registry.register(
+            name + "_extractor_fan_servo",
+            lambda: _build_extractor_fan_servo(config["servo_pin"]),
+        )
+    if "stepper_pins" in config:
+        # step motor to move the eggs
+        device_registry.register(
+            name + "_egg_movement_step_motor",
+            lambda: Stepmotor(*config["stepper_pins"]),
+        )
+
+
+def build_zone(config):
+    """
+    Build a zone from its configuration, sensors first.
+
+    Args:
+        config (dict): The zone configuration.
+
+    Returns:
+        Zone: The zone.
+    """
+    name = config["name"]
+
+    def optional_actuator(device):
+        key = name + "_" + device
+        return device_registry.lazy(key) if device_registry.is_registered(key) else None
+
+    hygrothermograph_key = name + "_hygrothermograph"
+
+    settings = {
+        key: config[key]
+        for key in (
+            "setpoint",
+            "min_humidity",
+            "max_humidity",
+            "turn_interval_s",
+            "turn_degree",
+            "final_day",
+            "pid_tunings",
+            "heater_window_ms",
+            "heater_min_on_ms",
+            "heater_min_off_ms",
+        )
+        if key in config
+    }
+
+    return Zone(
+        name,
+        thermistor=device_registry.get(name + "_thermistor"),
+        hygrothermograph=(
+            device_registry.get(hygrothermograph_key)
+            if device_registry.is_registered(hygrothermograph_key)
+            else None
+        ),
+        relay=device_registry.get(name + "_lamp_relay"),
+        servo=optional_actuator("extractor_fan_servo"),
+        stepmotor=optional_actuator("egg_movement_step_motor"),
+        metrics=metrics,
+        **settings
+    )
 
 
 def time_diff(first_date, second_date):
@@ -63,290 +233,571 @@ def time_diff(first_date, second_date):
     return days, hours, minutes
 
 
-def get_temperature(thermistor):
-    try:
-        temperature = thermistor.get_temperature()
-        if isinstance(temperature, float):
-            return temperature  
-        else:
-            # Log if temperature sensor is not found
-            print("GET_TEMPERATURE: Value is not float: {}".format(temperature))
-            return None
-    except:
-        # Log if temperature sensor is not found
-        print("GET_TEMPERATURE: Temperature sensor not found")
-        return None
+def format_lcd_value(value):
+    """
+    Format a sensor value to always use 5 characters on the LCD.
 
+    Args:
+        value (float): The value, or None when not available.
 
-def get_humidity(hygrothermograph):
-    try:
-        return hygrothermograph.get_humidity()
-    except:
-        # Log if hygrothermograph sensor is not found
-        print("GET_HUMIDITY: Humidity sensor not found")
-        return None
+    Returns:
+        str: The formatted value.
+    """
+    if value is None:
+        return "--.--"
+    if value >= 100:
+        return "{:.1f}".format(value)
+    if value >= 10:
+        return "{:.2f}".format(value)
+    return "0{:.2f}".format(value)
 
 
-def run_get_temperature_and_humidity(thermistor, hygrothermograph):
+def lcd_pages_for_zone(zone, number):
     """
-    Get the temperature and humidity from the sensors.
+    Build the LCD pages that show a zone. Every page starts with the zone
+    label, and every line fits the 16 columns of the display.
 
     Args:
-        thermistor (Thermistor): The thermistor for temperature measurement.
-        hygrothermograph (Hygrothermograph): The hygrothermograph for humidity measurement.
+        zone (Zone): The zone.
+        number (int): Zone number shown on the pages, 1 to 9.
 
     Returns:
-        None
+        tuple: The page functions.
     """
-    global current_date, temperature, humidity, last_10_temperatures
+    label = "Z%d" % number
 
-    while True:
-        lock.acquire()
+    def current_values():
+        # LCD page with the current temperature, humidity and incubation time
+        values = "{} T{} U{}".format(
+            label, format_lcd_value(zone.temperature), format_lcd_value(zone.humidity)
+        )
+        if current_date is None:
+            return values, "Starting..."
 
-        current_date = utime.localtime()
+        count_day, count_hour, count_minute = time_diff(START_DATE, current_date)
 
-        temperature = get_temperature(thermistor)
-        humidity = get_humidity(hygrothermograph)
+        return (
+            values,
+            "D:%.2d T%.2d:%.2d F:%.2d"
+            % (count_day, count_hour, count_minute, zone.final_day - count_day),
+        )
 
-        if temperature is not None:
-            last_10_temperatures.append(temperature)
+    def graph_line(name, value, min_value, max_value):
+        # the bar fills the columns left after the label and the value
+        text = "{} {}{} ".format(label, name, format_lcd_value(value))
+        width = lcd_views.lcd.num_columns - len(text)
+        return text + lcd_graphs.bar_graph(value, min_value, max_value, width=width)
+
+    def temperature_graph():
+        # temperature bar (30 to 40 °C) and the last minutes sparkline
+        return (
+            graph_line("T", zone.temperature, 30, 40),
+            lcd_graphs.sparkline(zone.temperature_history),
+        )
 
-        # Keep only the last 10 temperatures
-        if len(last_10_temperatures) > 10:
-            last_10_temperatures.pop(0)
-        
-        lock.release()
-        time.sleep(1)
+    def humidity_graph():
+        # humidity bar (0 to 100 %) and the last minutes sparkline
+        return (
+            graph_line("U", zone.humidity, 0, 100),
+            lcd_graphs.sparkline(zone.humidity_history),
+        )
+
+    def history():
+        # min and max temperature and humidity since boot
+        return (
+            "{} T{}-{}".format(
+                label,
+                format_lcd_value(zone.temperature_min),
+                format_lcd_value(zone.temperature_max),
+            ),
+            "   U{}-{}".format(
+                format_lcd_value(zone.humidity_min), format_lcd_value(zone.humidity_max)
+            ),
+        )
 
+    def turn_schedule():
+        # number of egg turns and the time to the next one
+        next_turn_s = zone.next_turn_s()
+        next_turn = "--" if next_turn_s is None else "%.2d" % (next_turn_s // 60)
+
+        return (
+            "%s Turns:%d" % (label, zone.egg_turns),
+            "Next turn:%smin" % next_turn,
+        )
 
-def run_config_temperature(relay, temp_min=37, temp_max=38):
+    def diagnostics():
+        # free memory, the lamp state and the heater duty
+        return (
+            "M:%dk Sw:%d"
+            % (gc.mem_free() // 1024, zone.heater_output.switch_count),
+            "%s Lamp:%s %d%%"
+            % (
+                label,
+                "ON" if zone.heater_output.is_on else "OFF",
+                int(zone.heater_pid.output * 100),
+            ),
+        )
+
+    return (
+        current_values,
+        temperature_graph,
+        humidity_graph,
+        history,
+        turn_schedule,
+        diagnostics,
+    )
+
+
+def build_status():
     """
-    Control lights to maintain the temperature within a specified range.
+    Snapshot of the current state, served by the HTTP status endpoint.
+
+    Returns:
+        dict: The current values.
+    """
+    return {
+        "zones": [zone.status() for zone in zones],
+        "supervisor": supervisor.status() if supervisor is not None else None,
+        "power": power_manager.status() if power_manager is not None else None,
+    }
 
-    Args:
-        relay (Pin): The relay pin for controlling the lights.
-        temp_min (float): The minimum temperature threshold.
-        temp_max (float): The maximum temperature threshold.
 
+def build_history():
+    """
     Returns:
-        None
+        dict: The per minute temperature and humidity history of each zone.
     """
-    global last_10_temperatures
+    return {
+        "interval_s": HISTORY_INTERVAL,
+        "zones": {
+            zone.name: {
+                "temperature": list(zone.temperature_history),
+                "humidity": list(zone.humidity_history),
+            }
+            for zone in zones
+        },
+    }
+
+
+def build_telemetry_publisher():
+    """
+    Create the MQTT publisher, when a broker is configured and umqtt is available.
 
-    while True:
-        lock.acquire()
+    Returns:
+        TelemetryPublisher: The publisher, or None.
+    """
+    if MQTT_BROKER is None:
+        return None
 
-        if len(last_10_temperatures) > 0:
-            current_average_temp = (sum(last_10_temperatures) / len(last_10_temperatures))
+    try:
+        from umqtt.simple import MQTTClient
+    except ImportError:
+        print("MAIN: umqtt not installed, telemetry disabled")
+        return None
 
-            if current_average_temp < temp_min:
-                # Turn off relay to use NC state, TURNING ON the lights
-                print("RUN_CONFIG_TEMPERATURE: Turn on lights")
-                relay.value(0)
+    return TelemetryPublisher(
+        lambda: MQTTClient(MQTT_CLIENT_ID, MQTT_BROKER, keepalive=60),
+        topic=MQTT_TOPIC,
+        fields=("zone", "t", "h", "lamp", "fan"),
+        queue=SampleQueue(max_items=20, flash_path="telemetry.q"),
+        batch_size=10,
+        metrics=metrics,
+    )
 
-            elif current_average_temp > temp_max:
-                # Turn on relay to use NO state, TURNING OFF the lights
-                print("RUN_CONFIG_TEMPERATURE: Turn off lights")
-                relay.value(1)
 
-        lock.release()
-        time.sleep(1)
+def update_clock():
+    global current_date
 
+    current_date = utime.localtime()
 
-def run_config_extractor_fan(servo, min_humidity=60, max_humidity=70):
-    """
-    Control the extractor fan to maintain the humidity within a specified range.
 
-    Args:
-        servo (Servo): The servo for controlling the extractor fan.
-        min_humidity (float): The minimum humidity threshold.
-        max_humidity (float): The maximum humidity threshold.
+def publish_telemetry_samples():
+    """
+    Add the current sample of every zone to the telemetry batch.
 
     Returns:
         None
     """
-    global humidity
-
-    while True:
-        time.sleep(10)
-        lock.acquire()
-
-        if humidity is not None:
-            # open the exaustor fan proportionally to the humidity
-            servo_position = int(
-                ((humidity - min_humidity) / (max_humidity - min_humidity)) * (0 - 50)
-                + 50
-            )
+    now = utime.ticks_ms()
+
+    for number, zone in enumerate(zones):
+        telemetry_publisher.add_sample(
+            now,
+            (
+                number,
+                zone.temperature,
+                zone.humidity,
+                zone.heater_output.is_on,
+                zone.extractor_fan_position,
+            ),
+        )
 
-            if servo_position < 0:
-                # full open
-                servo_position = 0
-            elif servo_position > 50:
-                # full close
-                servo_position = 50
 
-            servo.set_degree(degree=servo_position)
-            print(
-                f"RUN_CONFIG_EXTRACTOR_FAN: Servo position: {servo_position}, humidity: {humidity}"
-            )
-        
-        else:
-            servo.set_degree(degree=50)
-            print(
-                f"RUN_CONFIG_EXTRACTOR_FAN: Servo position: 50, humidity: Not Found"
+def render_zones_summary():
+    """
+    Returns:
+        str: One line per zone with its sensors and actuators.
+    """
+    lines = []
+    for zone in zones:
+        # the step motor is built on the first egg turn, not for a summary
+        stepper_position = (
+            zone.stepmotor.position
+            if device_registry.is_initialized(zone.name + "_egg_movement_step_motor")
+            else None
+        )
+        lines.append(
+            "{} T={} H={} set={} lamp={} duty={:.2f} sw={} fan={} turns={} stepper={}".format(
+                zone.name,
+                zone.temperature,
+                zone.humidity,
+                zone.heater_pid.setpoint,
+                "ON" if zone.heater_output.is_on else "OFF",
+                zone.heater_pid.output,
+                zone.heater_output.switch_count,
+                zone.extractor_fan_position,
+                zone.egg_turns,
+                stepper_position,
             )
-
-        lock.release()        
+        )
+    return "\n".join(lines)
 
 
-def run_input_lcd_light(button, lcd):
+def update_http_responses(server):
     """
-    Turn on the LCD backlight when the button is pressed.
+    Render the HTTP responses and the shell status, so both are served
+    from memory.
 
     Args:
-        button (Pin): The button pin.
-        lcd (LCD): The LCD display.
+        server (StatusServer): The HTTP server, None when not running.
 
     Returns:
         None
     """
-    global current_date
-
-    started_light = utime.localtime()
-    lcd.backlight_on()
+    global rendered_status
+
+    rendered_status = render_zones_summary()
+    if server is None:
+        return
+
+    status = build_status()
+
+    for zone in zones:
+        metrics.set(zone.name + "_temperature", zone.temperature)
+        metrics.set(zone.name + "_temperature_raw", zone.raw_temperature)
+        metrics.set(zone.name + "_temperature_rate_per_min", zone.temperature_rate * 60)
+        metrics.set(zone.name + "_thermistor_offset", zone.estimator.offset)
+        metrics.set(zone.name + "_humidity", zone.humidity)
+        metrics.set(zone.name + "_heater_duty", zone.heater_pid.output)
+        metrics.set(zone.name + "_heater_error", zone.heater_pid.error)
+        metrics.set(zone.name + "_extractor_fan_position", zone.extractor_fan_position)
+        metrics.set(zone.name + "_lamp_switches", zone.heater_output.switch_count)
+    metrics.set("mem_free", gc.mem_free())
+    metrics.set("http_requests", server.requests)
+    metrics.set("http_errors", server.errors)
+
+    server.set_response("/status", json.dumps(status))
+    server.set_response("/history", json.dumps(build_history()))
+    server.set_response("/metrics", metrics.prometheus(), CONTENT_TYPE_TEXT)
+    server.set_response("/metrics.json", json.dumps(metrics.as_dict()))
+
+
+def shell_set(args):
+    """
+    Shell command: set <zone> <setpoint|kp|ki|kd|min_humidity|max_humidity> <value>
+    """
+    zone_name, key, value = args
+    zone = zone_controller.get_zone(zone_name)
+    if zone is None:
+        return "Unknown zone: {}".format(zone_name)
+
+    value = float(value)
+    pid = zone.heater_pid
+    if key == "setpoint":
+        pid.setpoint = value
+    elif key in ("kp", "ki", "kd"):
+        tunings = {"kp": pid.kp, "ki": pid.ki, "kd": pid.kd}
+        tunings[key] = value
+        pid.set_tunings(tunings["kp"], tunings["ki"], tunings["kd"])
+    elif key in ("min_humidity", "max_humidity"):
+        setattr(zone, key, value)
+    else:
+        return "Unknown setting: {}".format(key)
+    return "{} {} = {}".format(zone_name, key, value)
+
+
+def shell_turn(args):
+    """
+    Shell command: turn <zone>
+    """
+    zone = zone_controller.get_zone(args[0])
+    if zone is None:
+        return "Unknown zone: {}".format(args[0])
+    return "Turning eggs" if zone.turn_eggs(force=True) else "Cannot turn now"
 
-    while True:
-        lock.acquire()
 
-        if not button.value():
-            started_light = utime.localtime()
-            lcd.backlight_on()
+def shell_power(args):
+    """
+    Shell command: power [normal|low]
+    """
+    if args:
+        power_manager.set_mode(args[0])
+    return " ".join(
+        "{}={}".format(key, value) for key, value in sorted(power_manager.status().items())
+    )
 
-        if started_light is not None:
-            _, _, count_minute = time_diff(started_light, current_date)
 
-            if count_minute >= 1:
-                started_light = None
-                lcd.backlight_off()
+def shell_supervisor(args):
+    status = supervisor.status()
+    lines = ["healthy: {}".format(status["healthy"])]
+    for name, task in sorted(status["tasks"].items()):
+        lines.append(
+            "{} {}{} age={}ms failures={} restarts={} {}".format(
+                name,
+                task["state"],
+                "*" if task["critical"] else "",
+                task["heartbeat_age_ms"],
+                task["failures"],
+                task["restarts"],
+                task["last_error"] or "",
+            )
+        )
+    for name, latency_ms in status["stalls"]:
+        lines.append("stall {} {}ms".format(name, latency_ms))
+    return "\n".join(lines)
 
-        lock.release()
 
-def run_move_eggs(step_motor):
+def build_shell(scheduler):
     """
-    Move the eggs hourly.
+    Create the diagnostics shell and its application commands.
 
     Args:
-        step_motor (Stepmotor): The step motor.
+        scheduler (Scheduler): The scheduler, listed by the "tasks" command.
 
     Returns:
-        None
+        DiagnosticShell: The shell.
     """
-    global START_DATE, current_date, final_date
+    shell = DiagnosticShell(
+        metrics=metrics, on_input=lambda: scheduler.clock.keep_awake(SHELL_AWAKE_MS)
+    )
+    shell.register("status", lambda args: rendered_status, "Zones snapshot")
+    shell.register("set", shell_set, "set <zone> <setting> <value>")
+    shell.register("turn", shell_turn, "turn <zone>, turn the eggs now")
+    shell.register(
+        "tasks",
+        lambda args: "\n".join(
+            "{} {}ms {}".format(task.name, task.period_ms, "on" if task.enabled else "off")
+            for task in scheduler.tasks
+        ),
+        "Scheduler tasks",
+    )
+    shell.register("supervisor", shell_supervisor, "Task health and stalls")
+    shell.register("power", shell_power, "power [normal|low], current and battery time")
+    return shell
 
-    while True:        
-        time.sleep(3600)
-        lock.acquire()
 
-        count_day, *_ = time_diff(START_DATE, current_date)
+def low_power_periods():
+    """
+    Task periods of the low power mode. The thermistor and the heater keep a
+    guaranteed 1 s period, matching the PID sample time, and share the same
+    wake up. The DHT, the LCD and the shell slow down, the network tasks are
+    stopped by the power manager. The HTTP responses are still rendered for
+    the shell status, at the rate of the LCD.
 
-        if count_day + 3 < final_date:
-            step_motor.move_degree(StepMotorDirectionOptions.CLOCKWISE, 180)
-        else:
-            break
+    Returns:
+        dict: Task name to period in milliseconds.
+    """
+    periods = {
+        "lcd": 10000,
+        "http_render": 10000,
+        "shell": 500,
+        "telemetry_sample": 10000,
+    }
+    for zone in zones:
+        periods[zone.name + "_heater"] = 1000
+        periods[zone.name + "_humidity"] = 10000
+        periods[zone.name + "_extractor_fan"] = 60000
+    return periods
+
+
+def refresh_lcd(scheduler):
+    """
+    Refresh the LCD. The first run builds the display, its pages and the
+    button, so the slow I2C discovery happens after the sensors were sampled.
 
-        lock.release()
+    Args:
+        scheduler (Scheduler): The scheduler, receives the button events.
+
+    Returns:
+        None
+    """
+    global lcd_graphs, lcd_views
+
+    if lcd_views is None:
+        lcd = device_registry.get("lcd_device")
+        lcd_graphs = GraphRenderer(GlyphCache(lcd))
+        pages = ()
+        for number, zone in enumerate(zones):
+            pages += lcd_pages_for_zone(zone, number + 1)
+        lcd_views = LcdViewManager(
+            lcd, pages=pages, backlight_timeout_ms=60000, clock=scheduler.clock
+        )
+        button = Button(
+            device_registry.get("lcd_light_button"), scheduler, event="lcd_button"
+        )
+        # a press ends the light sleep of the low power mode
+        scheduler.clock.wake_on_pin(button.pin, 0, button.check)
+        scheduler.subscribe("lcd_button", lcd_views.on_button)
+        if power_manager is not None:
+            apply_lcd_power_mode(power_manager.mode)
+        device_registry.report()
 
-    lock.release()
+    lcd_views.refresh()
 
 
-def run_show_basic_lcd_informations(lcd):
+def apply_lcd_power_mode(mode):
     """
-    Display basic information on the LCD.
+    The backlight is off in the low power mode and only lights up for a
+    moment on a button press.
 
     Args:
-        lcd (Lcd): The LCD display.
+        mode (str): The PowerMode.
 
     Returns:
         None
     """
-    global current_date, last_10_temperatures, humidity, temperature, final_date, START_DATE
+    if lcd_views is None:
+        return
+    if mode == PowerMode.LOW:
+        lcd_views.backlight_timeout_ms = 10000
+        lcd_views.lcd.backlight_off()
+    else:
+        lcd_views.backlight_timeout_ms = 60000
+        lcd_views.lcd.backlight_on()
 
-    while True:
-        lock.acquire()
 
-        if current_date is None:
-            lock.release()
-            time.sleep(2)
-            continue
-
-        count_day, count_hour, count_minute = time_diff(START_DATE, current_date)
+def build_power_manager(scheduler):
+    """
+    Create the power manager. The Wi-Fi is lost in light sleep, so the HTTP
+    server and the MQTT publisher stop in the low power mode, the telemetry
+    samples are kept in the backlog until the normal mode.
 
-        # Display
-        if temperature is None:
-            temperature_str = "--.--"
-        else:
-            if temperature >= 100:
-                temperature_str = "{:.1f}".format(temperature)
-            elif temperature < 100 and temperature >= 10:
-                temperature_str = "{:.2f}".format(temperature)
-            else:
-                temperature_str = "0{:.2f}".format(temperature)
-
-        if humidity is None:
-            humidity_str = "--.--"
-        else:
-            if humidity >= 100:
-                humidity_str = "{:.1f}".format(humidity)
-            elif humidity < 100 and humidity >= 10:
-                humidity_str = "{:.2f}".format(humidity)
-            else:
-                humidity_str = "0{:.2f}".format(humidity)
-
-        lcd.move_to(0, 0)
-        lcd.put_str("T:{}  U:{}".format(temperature_str, humidity_str))
-
-        lcd.move_to(0, 1)
-        lcd.put_str(
-            "D:%.2d T%.2d:%.2d F:%.2d"
-            % (
-                count_day,
-                count_hour,
-                count_minute,
-                final_date - count_day,
-            )
-        )
+    Args:
+        scheduler (Scheduler): The scheduler, using a PowerClock.
 
-        lock.release()
-        time.sleep(10)
+    Returns:
+        PowerManager: The power manager.
+    """
+    power = PowerManager(
+        scheduler,
+        low_power_periods(),
+        low_power_disabled=("http", "telemetry"),
+        battery_mah=BATTERY_MAH,
+        metrics=metrics,
+    )
+    power.add_load(
+        "backlight",
+        BACKLIGHT_MA,
+        lambda: lcd_views is not None and lcd_views.lcd.backlight,
+    )
+    power.on_change(apply_lcd_power_mode)
+    return power
 
 
 def main():
     """
     Main function.
     """
-    _thread.start_new_thread(
-        run_get_temperature_and_humidity, (thermistor_device, hygrothermograph_device)
-    )
-    _thread.start_new_thread(run_config_temperature, (lamp_relay,))
-    _thread.start_new_thread(
-        run_config_extractor_fan, (extractor_fan_servo, hygrothermograph_device)
-    )
-    # _thread.start_new_thread(run_input_lcd_light, (lcd_light_button, lcd_device))
-    _thread.start_new_thread(run_move_eggs, (egg_movement_step_motor,))
-    _thread.start_new_thread(
-        run_show_basic_lcd_informations,
-        (lcd_device,),
-    )
+    global power_manager, supervisor, telemetry_publisher, zones, zone_controller
+
+    metrics.set("reset_cause", reset_cause())
+
+    telemetry_publisher = build_telemetry_publisher()
+    # the clock waits in light sleep while in the low power mode
+    scheduler = Scheduler(clock=PowerClock(), metrics=metrics)
+    scheduler.add_task("clock", update_clock, period_ms=1000)
+
+    # every zone is sensed and controlled by tasks of the same scheduler
+    zones_config = load_zones_config()
+    for config in zones_config:
+        register_zone_devices(config)
+    zones = [build_zone(config) for config in zones_config]
+    zone_controller = ZoneController(scheduler, zones)
+    for zone in zones:
+        if zone.servo_task is not None:
+            zone.extractor_fan_position = EXTRACTOR_FAN_START_DEGREE
+            zone.servo_task.enabled = True
+
+    if TRACE_PATH is not None:
+        trace_recorder = TraceRecorder(TRACE_PATH, max_bytes=TRACE_MAX_BYTES)
+        for channel, zone in enumerate(zones):
+            trace_recorder.attach_thermistor(zone.thermistor, channel)
+            if zone.hygrothermograph is not None:
+                trace_recorder.attach_hygrothermograph(zone.hygrothermograph, channel)
+        scheduler.add_task("trace", trace_recorder.flush, period_ms=10000)
+
+    # LCD and button, built after the first sensor samples of the same run
+    scheduler.add_task("lcd", lambda: refresh_lcd(scheduler), period_ms=2000)
+
+    # status and metrics over HTTP, needs the network to be up already
+    http_server = StatusServer(port=HTTP_PORT)
+    try:
+        http_server.start()
+        scheduler.add_task(
+            "http_render", lambda: update_http_responses(http_server), period_ms=2000
+        )
+        scheduler.add_task("http", http_server.poll, period_ms=50)
+    except OSError as error:
+        print("MAIN: HTTP server not started: {}".format(error))
+        scheduler.add_task(
+            "http_render", lambda: update_http_responses(None), period_ms=2000
+        )
+
+    # diagnostics shell on the REPL
+    scheduler.add_task("shell", build_shell(scheduler).poll, period_ms=100)
 
-    # TEST
-    # run_config_extractor_fan(servo=extractor_fan_servo)
-    # run_show_basic_lcd_informations(lcd=lcd_device )
-    # run_move_eggs(step_motor=egg_movement_step_motor)
+    if telemetry_publisher is not None:
+        scheduler.add_task(
+            "telemetry_sample", publish_telemetry_samples, period_ms=1000
+        )
+        scheduler.add_task("telemetry", telemetry_publisher.poll, period_ms=1000)
+
+    # battery backup: slower tasks, light sleep and no backlight
+    power_manager = build_power_manager(scheduler)
+    scheduler.add_task("power", power_manager.update, period_ms=10000)
+    if POWER_SENSE_PIN is not None:
+        power_sense = Pin(POWER_SENSE_PIN, Pin.IN)
+        scheduler.clock.wake_on_pin(power_sense, 1)
+        scheduler.add_task(
+            "power_sense",
+            lambda: power_manager.set_mode(
+                PowerMode.NORMAL if power_sense.value() else PowerMode.LOW
+            ),
+            period_ms=1000,
+        )
+
+    # every task is restarted on errors and stalls, the board is reset when
+    # the temperature control of a zone keeps failing
+    critical_tasks = []
+    for zone in zones:
+        critical_tasks += [zone.name + "_temperature", zone.name + "_heater"]
+    supervisor = Supervisor(
+        scheduler,
+        wdt=WDT(timeout=WDT_TIMEOUT_MS),
+        metrics=metrics,
+        is_paused=power_manager.is_disabled,
+    )
+    for task in list(scheduler.tasks):
+        supervisor.watch(task.name, critical=task.name in critical_tasks)
+    supervisor.start()
 
-    while True:
-        pass
+    scheduler.run_forever()
 
 
-lock = _thread.allocate_lock()
+lcd_graphs = None
+lcd_views = None
+power_manager = None
+supervisor = None
+zone_controller = None
 if __name__ == "__main__":
     main()
@@ -0,0 +1,88 @@
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from esp_libs.http_server import StatusServer  # noqa: E402
+
+"""
+HTTP server check, run on a Linux host:
+python tools/http_server_check.py [clients]
+
+Serves a status response from StatusServer polled like the scheduler task
+does, and fires concurrent requests at it. Every request must get the
+response, within the time of a few polls.
+"""
+
+POLL_PERIOD_MS = 50
+BODY = '{"temperature": 37.5}'
+
+
+def request(port, results, index):
+    start = time.monotonic()
+    try:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+        sock.sendall(b"GET /status HTTP/1.0\r\n\r\n")
+        data = b""
+        while True:
+            chunk = sock.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        results[index] = (data.endswith(BODY.encode()), time.monotonic() - start)
+    except OSError as error:
+        results[index] = (False, error)
+
+
+def main(clients=21):
+    server = StatusServer(port=0, host="127.0.0.1")
+    server.set_response("/status", BODY)
+    server.start()
+
+    running = True
+
+    def poll_loop():
+        while running:
+            server.poll()
+            time.sleep(POLL_PERIOD_MS / 1000)
+
+    poller = threading.Thread(target=poll_loop)
+    poller.start()
+
+    results = [None] * clients
+    threads = [
+        threading.Thread(target=request, args=(server.port, results, index))
+        for index in range(clients)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    running = False
+    poller.join()
+    server.stop()
+
+    failed = [result for result in results if not result[0]]
+    durations = [result[1] for result in results if result[0]]
+    print(
+        "{} requests, {} failed, {:.2f} s, slowest {:.2f} s, server errors {}".format(
+            clients,
+            len(failed),
+            elapsed,
+            max(durations) if durations else 0,
+            server.errors,
+        )
+    )
+    for result in failed:
+        print("failed: {}".format(result[1]))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 21))
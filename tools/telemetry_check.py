@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from esp_libs.telemetry import SampleQueue, TelemetryPublisher  # noqa: E402
+
+"""
+Telemetry check, run on a host:
+python tools/telemetry_check.py [samples]
+
+Publishes numbered samples through TelemetryPublisher and a SampleQueue
+spilling to a file, to a local stand-in broker that goes down for a while
+in the middle of the run. Every sample must reach the broker once, in
+order, after the outage.
+"""
+
+TOPIC = b"brooder/telemetry"
+POLL_PERIOD_MS = 10
+SAMPLES_PER_POLL = 2
+
+
+class FakeBroker:
+    def __init__(self):
+        self.up = True
+        self.payloads = []
+
+
+class FakeClient:
+    """
+    MQTTClient stand-in, refuses to connect or publish while the broker is down.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def connect(self, timeout=None):
+        if not self.broker.up:
+            raise OSError("ECONNREFUSED")
+
+    def publish(self, topic, msg):
+        if not self.broker.up:
+            raise OSError("ECONNRESET")
+        self.broker.payloads.append((topic, msg))
+
+    def disconnect(self):
+        pass
+
+
+def main(samples=600):
+    broker = FakeBroker()
+    flash_dir = tempfile.mkdtemp()
+    flash_path = os.path.join(flash_dir, "telemetry.q")
+    queue = SampleQueue(max_items=5, flash_path=flash_path)
+    publisher = TelemetryPublisher(
+        lambda: FakeClient(broker),
+        topic=TOPIC,
+        fields=("n",),
+        queue=queue,
+        batch_size=3,
+        max_batch_age_ms=100,
+        reconnect_ms=20,
+        max_reconnect_ms=200,
+    )
+
+    # the broker is down for the middle third of the samples
+    outage = (samples // 3, 2 * samples // 3)
+    start = time.monotonic()
+    sent = 0
+    max_depth = 0
+    while publisher.published_samples < samples:
+        for _ in range(SAMPLES_PER_POLL):
+            if sent < samples:
+                broker.up = not outage[0] <= sent < outage[1]
+                publisher.add_sample(int(time.monotonic() * 1000), (sent,))
+                sent += 1
+        if sent >= samples:
+            broker.up = True
+        publisher.poll()
+        max_depth = max(max_depth, len(queue))
+        time.sleep(POLL_PERIOD_MS / 1000)
+        if time.monotonic() - start > 60:
+            break
+    elapsed = time.monotonic() - start
+    if os.path.exists(flash_path):
+        os.remove(flash_path)
+    os.rmdir(flash_dir)
+
+    received = []
+    for topic, msg in broker.payloads:
+        assert topic == TOPIC
+        received += [row[1] for row in json.loads(msg)["d"]]
+
+    ok = received == list(range(samples)) and queue.dropped == 0
+    print(
+        "{} samples, {} received in {} payloads, {:.2f} s, "
+        "deepest queue {}, dropped {}, errors {}, {}".format(
+            samples,
+            len(received),
+            len(broker.payloads),
+            elapsed,
+            max_depth,
+            queue.dropped,
+            publisher.errors,
+            "in order" if ok else "LOST OR OUT OF ORDER",
+        )
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 600))
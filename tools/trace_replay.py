@@ -0,0 +1,144 @@
+import json
+import sys
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from esp_libs.hygrothermograph import Hygrothermograph  # noqa: E402
+from esp_libs.metrics import Metrics  # noqa: E402
+from esp_libs.scheduler import Scheduler, VirtualClock  # noqa: E402
+from esp_libs.thermistor import Thermistor  # noqa: E402
+from esp_libs.trace import TraceReplay  # noqa: E402
+from esp_libs.zones import Zone, ZoneController  # noqa: E402
+
+"""
+Trace replay, run on a host:
+python tools/trace_replay.py trace.bin [zones.json]
+
+Builds the zones of a zones.json (the ZONES_CONFIG_PATH of main.py, the
+default zone of main.py when not given) on a VirtualClock, feeds them the
+raw readings of a trace recorded with TRACE_PATH, and prints the outcome of
+the current firmware for each zone. The trace channel of a zone is its index in
+the file, as recorded by main.py. The recorded readings do not react to
+the relay, so compare the outcome of two revisions on the same trace.
+"""
+
+# Zone settings read from the zones configuration, as in main.build_zone
+ZONE_SETTINGS = (
+    "setpoint",
+    "min_humidity",
+    "max_humidity",
+    "turn_interval_s",
+    "turn_degree",
+    "final_day",
+    "pid_tunings",
+    "heater_window_ms",
+    "heater_min_on_ms",
+    "heater_min_off_ms",
+)
+SAMPLE_PERIOD_MS = 1000
+DEFAULT_ZONES = [{"name": "zone1", "dht_pin": 18}]
+
+
+class FakeRelay:
+    def __init__(self):
+        self._value = 1
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+
+class ZoneOutcome:
+    """
+    Temperature error and heater duty of a zone, sampled every second.
+    """
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.samples = 0
+        self.sum_abs_error = 0.0
+        self.max_abs_error = 0.0
+        self.on_samples = 0
+
+    def sample(self):
+        if self.zone.temperature is None:
+            return
+        error = abs(self.zone.temperature - self.zone.heater_pid.setpoint)
+        self.samples += 1
+        self.sum_abs_error += error
+        self.max_abs_error = max(self.max_abs_error, error)
+        if self.zone.heater_output.is_on:
+            self.on_samples += 1
+
+
+def load_zones_config(path):
+    if path is None:
+        return DEFAULT_ZONES
+    with open(path) as file:
+        return json.load(file)
+
+
+def main(trace_path, zones_path=None):
+    clock = VirtualClock()
+    scheduler = Scheduler(clock=clock)
+    replay = TraceReplay(trace_path, clock)
+    metrics = Metrics()
+
+    zones = []
+    for channel, config in enumerate(load_zones_config(zones_path)):
+        zones.append(
+            Zone(
+                config["name"],
+                thermistor=Thermistor(adc=replay.adc(channel)),
+                relay=FakeRelay(),
+                hygrothermograph=(
+                    Hygrothermograph(dht=replay.dht(channel))
+                    if "dht_pin" in config
+                    else None
+                ),
+                metrics=metrics,
+                clock=clock,
+                **{key: config[key] for key in ZONE_SETTINGS if key in config}
+            )
+        )
+    ZoneController(scheduler, zones)
+
+    outcomes = [ZoneOutcome(zone) for zone in zones]
+    for outcome in outcomes:
+        scheduler.add_task(
+            outcome.zone.name + "_outcome", outcome.sample, SAMPLE_PERIOD_MS
+        )
+
+    start = time.monotonic()
+    scheduler.run_until(replay.start_ms + replay.duration_ms)
+    elapsed = time.monotonic() - start
+
+    hours = replay.duration_ms / 3600000
+    print("{:.1f} h of trace replayed in {:.1f} s".format(hours, elapsed))
+    for outcome in outcomes:
+        zone = outcome.zone
+        samples = max(outcome.samples, 1)
+        print(
+            "{}: mean |error| {:.3f} °C, max |error| {:.2f} °C, "
+            "relay switches {} ({:.0f}/h), heater on {:.0%}, "
+            "sensor errors {} temperature / {} humidity".format(
+                zone.name,
+                outcome.sum_abs_error / samples,
+                outcome.max_abs_error,
+                zone.heater_output.switch_count,
+                zone.heater_output.switch_count / hours if hours else 0,
+                outcome.on_samples / samples,
+                metrics.counters.get(zone.name + "_temperature_sensor_errors", 0),
+                metrics.counters.get(zone.name + "_humidity_sensor_errors", 0),
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python tools/trace_replay.py trace.bin [zones.json]")
+        sys.exit(2)
+    sys.exit(main(*sys.argv[1:3]))